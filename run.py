@@ -8,41 +8,52 @@ USB继电器RTU控制软件运行脚本 - 跨平台版本
 
 import os
 import sys
-import subprocess
+import functools
+import shlex
 import platform
-from pathlib import Path
 
+# 平台名称只在导入时查询一次
+_PLATFORM = platform.system()
+_SYS = _PLATFORM.lower()
+
+@functools.lru_cache(maxsize=1)
 def check_dialout_permission():
     """检查当前用户是否有dialout组权限（仅Linux）"""
-    if platform.system().lower() != "linux":
+    if _SYS != "linux":
         return True  # Windows/macOS不需要dialout权限
     
     try:
         import grp
-        # 检查用户是否在dialout组中
-        current_groups = [grp.getgrgid(gid).gr_name for gid in os.getgroups()]
-        return 'dialout' in current_groups
-    except:
+        # 只查询一次dialout组，避免对每个GID逐个getgrgid
+        return grp.getgrnam('dialout').gr_gid in os.getgroups()
+    except KeyError:
         return False
 
 def run_with_permission(cmd_args):
     """根据平台使用适当的权限运行命令"""
-    current_os = platform.system().lower()
+    current_os = _SYS
+    direct_cmd = ["python", "usb_relay.py"] + cmd_args
     
-    if current_os == "linux":
-        # Linux: 处理dialout权限
-        if check_dialout_permission():
-            # 已有权限，直接运行
-            cmd = ["python", "usb_relay.py"] + cmd_args
-        else:
-            # 需要临时获取权限
-            cmd = ["sg", "dialout", "-c", f"python usb_relay.py {' '.join(cmd_args)}"]
+    if current_os == "linux" and not check_dialout_permission():
+        # 需要临时获取权限（sg只接受单个命令字符串，参数需逐个转义）
+        cmd = ["sg", "dialout", "-c", shlex.join(direct_cmd)]
+    elif current_os != "windows":
+        # Linux/macOS已有权限：直接替换当前进程，避免再启动一个Python解释器
+        try:
+            os.execvp(direct_cmd[0], direct_cmd)
+        except FileNotFoundError:
+            print("错误：无法找到必要的命令")
+            return 1
     else:
-        # Windows/macOS: 直接运行
-        cmd = ["python", "usb_relay.py"] + cmd_args
+        # Windows: os.exec*会让父进程提前退出，仍使用子进程
+        cmd = direct_cmd
+    
+    # 只有需要子进程时才导入subprocess
+    import subprocess
     
     try:
-        result = subprocess.run(cmd, check=True)
+        # close_fds=False 允许CPython使用posix_spawn()快速路径
+        result = subprocess.run(cmd, check=True, close_fds=False)
         return result.returncode
     except subprocess.CalledProcessError as e:
         return e.returncode
@@ -55,7 +66,7 @@ def run_with_permission(cmd_args):
 
 def main():
     """主函数 - 跨平台版本"""
-    current_os = platform.system()
+    current_os = _PLATFORM
     
     if len(sys.argv) < 2:
         print("USB继电器RTU控制软件 - 跨平台版本")
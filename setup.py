@@ -47,7 +47,7 @@ setup(
         "pyserial>=3.5",
         "click>=8.0.0",
         "rich>=12.0.0",
-        "PyYAML>=6.0",
+        "PyYAML>=6.0",  # 带libyaml的发行包会自动使用C加速的加载器
     ],
     extras_require={
         "dev": [
@@ -57,6 +57,9 @@ setup(
             "flake8>=5.0.0",
             "mypy>=0.991",
         ],
+        "fast": [
+            "orjson>=3.6",
+        ],
         "build": [
             "setuptools>=65.0.0",
             "wheel>=0.37.0",
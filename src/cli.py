@@ -11,41 +11,163 @@
 import click
 import sys
 import time
+import atexit
+import signal
+import functools
 from typing import List, Optional
-from rich.console import Console
-from rich.table import Table
-from rich.panel import Panel
-from rich.progress import Progress, SpinnerColumn, TextColumn
-from rich.prompt import Confirm
 
 try:
     from .device_controller import USBRelayController, DeviceManager, RelaySequence
-    from .modbus_rtu import ModbusRTUException
-    from .daemon import DaemonClient, start_daemon_if_needed
+    from .modbus_rtu import ModbusRTUClient, ModbusRTUException
 except ImportError:
     from device_controller import USBRelayController, DeviceManager, RelaySequence
-    from modbus_rtu import ModbusRTUException
-    from daemon import DaemonClient, start_daemon_if_needed
+    from modbus_rtu import ModbusRTUClient, ModbusRTUException
 
 
-console = Console()
+@functools.lru_cache(maxsize=1)
+def _get_console():
+    """首次使用时才创建Rich控制台，--help等命令无需加载rich"""
+    from rich.console import Console
+    return Console()
 
 
-def handle_exceptions(func):
-    """异常处理装饰器"""
-    def wrapper(*args, **kwargs):
+class _LazyConsole:
+    """控制台代理，将属性访问转发给延迟创建的Console"""
+    
+    def __getattr__(self, name):
+        return getattr(_get_console(), name)
+
+
+console = _LazyConsole()
+
+# 监控显示用的状态符号，按布尔值索引（False=关/低, True=开/高）
+_STATE_GLYPHS = ("[red]○[/red]", "[green]●[/green]")
+
+# 状态表格单元格，按布尔值索引
+_RELAY_CELL = ("[red]关闭[/red]", "[green]开启[/green]")
+_INPUT_CELL = ("[red]低电平[/red]", "[green]高电平[/green]")
+
+# 设备信息面板模板，模块加载时构建一次
+_INFO_TEMPLATE = """\
+[cyan]设备端口:[/cyan] {port}
+[cyan]从设备地址:[/cyan] {slave_id}
+[cyan]连接状态:[/cyan] {connection}
+[cyan]波特率:[/cyan] {baudrate}
+[cyan]数据位:[/cyan] 8
+[cyan]停止位:[/cyan] 1
+[cyan]校验位:[/cyan] 无"""
+_CONNECTION_CELL = ("[red]连接失败[/red]", "[green]已连接[/green]")
+
+# 超过该数量时不再绘制表格，逐行输出纯文本以省去Rich的表格布局计算
+_PLAIN_OUTPUT_THRESHOLD = 64
+_PLAIN_GLYPHS = ("○", "●")
+
+
+def _print_plain_states(states, id_attr: str):
+    """以纯文本逐行输出大量状态，一次写出，不经过Rich标记解析和布局"""
+    click.echo("\n".join(
+        f"{getattr(s, id_attr):4d} {_PLAIN_GLYPHS[s.state]} {s.address_hex}"
+        for s in states
+    ))
+
+
+@functools.lru_cache(maxsize=4)
+def _controller(port: str, slave_id: int) -> USBRelayController:
+    """打开设备连接并按(端口, 从地址)缓存，同一进程内复用，退出时自动断开"""
+    controller = USBRelayController(port, slave_id)
+    controller.connect()
+    atexit.register(controller.disconnect)
+    return controller
+
+
+def _get_controller_or_daemon(port: str, slave_id: int):
+    """守护进程运行时通过它操作继电器（串口已被其占用），否则直接打开设备"""
+    daemon_module = _daemon()
+    client = daemon_module.get_daemon_client(port)
+    if client.is_daemon_running():
+        return daemon_module.DaemonRelayController(client)
+    return _controller(port, slave_id)
+
+
+@functools.lru_cache(maxsize=1)
+def _daemon():
+    """延迟导入守护进程模块，只有用到守护进程的命令才加载（结果缓存）"""
+    try:
+        from . import daemon
+    except ImportError:
+        import daemon
+    return daemon
+
+
+# 收到中断/终止信号时需要执行的清理函数（如停止守护进程），后注册的先执行
+_cleanups = []
+
+
+def _shutdown(sig, frame):
+    """统一的信号处理：依次执行已注册的清理函数后退出"""
+    while _cleanups:
+        _cleanups.pop()()
+    sys.exit(0)
+
+
+class ModbusCliError(click.ClickException):
+    """命令执行错误，由Click统一捕获并以退出码1结束"""
+    exit_code = 1
+    
+    def show(self, file=None):
+        console.print(f"[red]{self.message}[/red]")
+
+
+class _CliGroup(click.Group):
+    """根命令组：在一处将命令抛出的异常转换为ModbusCliError，无需逐个命令包装"""
+    
+    def invoke(self, ctx):
         try:
-            return func(*args, **kwargs)
+            return super().invoke(ctx)
+        except (click.ClickException, click.exceptions.Exit, click.Abort):
+            raise
         except ModbusRTUException as e:
-            console.print(f"[red]通信错误: {e}[/red]")
-            sys.exit(1)
+            raise ModbusCliError(f"通信错误: {e}") from e
         except Exception as e:
-            console.print(f"[red]未知错误: {e}[/red]")
-            sys.exit(1)
-    return wrapper
+            raise ModbusCliError(f"未知错误: {e}") from e
+
+
+def _run_with_spinner(description: str, func, *args):
+    """在后台线程执行耗时的设备枚举/探测，主线程负责刷新进度动画"""
+    from concurrent.futures import ThreadPoolExecutor
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+    
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        console=_get_console(),
+        transient=True,
+    ) as progress:
+        progress.add_task(description, total=None)
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            future = executor.submit(func, *args)
+            while not future.done():
+                progress.refresh()
+                time.sleep(0.05)
+            return future.result()
+
+
+def _run_on_ports(ports, slave_id: int, func) -> List[bool]:
+    """
+    对每个端口的设备执行序列操作；多个端口时每块板各用一个线程并发执行，
+    总耗时与单块板相同，而不是随板数线性增加
+    """
+    controllers = [_get_controller_or_daemon(port, slave_id) for port in ports]
+    if len(controllers) == 1:
+        return [func(RelaySequence(controllers[0]))]
+    
+    from concurrent.futures import ThreadPoolExecutor
+    
+    with ThreadPoolExecutor(max_workers=len(controllers)) as executor:
+        return list(executor.map(lambda c: func(RelaySequence(c)), controllers))
 
 
-@click.group()
+@click.group(cls=_CliGroup)
 @click.version_option(version="1.0.0", prog_name="USB继电器RTU控制软件")
 def cli():
     """USB继电器RTU控制软件
@@ -53,7 +175,8 @@ def cli():
     基于Modbus RTU协议的跨平台USB继电器控制工具。
     支持继电器控制、数字量输入读取和设备管理。
     """
-    pass
+    signal.signal(signal.SIGINT, _shutdown)
+    signal.signal(signal.SIGTERM, _shutdown)
 
 
 @cli.group()
@@ -63,17 +186,12 @@ def device():
 
 
 @device.command("list")
-def list_devices():
+@click.option("--no-cache", is_flag=True, help="忽略缓存，重新扫描串口")
+def list_devices(no_cache: bool):
     """列出所有串口设备"""
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-        transient=True,
-    ) as progress:
-        task = progress.add_task("正在扫描串口设备...", total=None)
-        devices = DeviceManager.list_serial_ports()
-        progress.update(task, completed=True)
+    from rich.table import Table
+    
+    devices = _run_with_spinner("正在扫描串口设备...", DeviceManager.list_serial_ports, not no_cache)
     
     if not devices:
         console.print("[yellow]未找到任何串口设备[/yellow]")
@@ -99,17 +217,12 @@ def list_devices():
 
 
 @device.command("usb")
-def list_usb_devices():
+@click.option("--no-cache", is_flag=True, help="忽略缓存，重新扫描串口")
+def list_usb_devices(no_cache: bool):
     """列出USB转串口设备"""
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-        transient=True,
-    ) as progress:
-        task = progress.add_task("正在扫描USB串口设备...", total=None)
-        devices = DeviceManager.find_usb_serial_devices()
-        progress.update(task, completed=True)
+    from rich.table import Table
+    
+    devices = _run_with_spinner("正在扫描USB串口设备...", DeviceManager.find_usb_serial_devices, not no_cache)
     
     if not devices:
         console.print("[yellow]未找到任何USB串口设备[/yellow]")
@@ -133,17 +246,10 @@ def list_usb_devices():
 
 
 @device.command("auto-detect")
-def auto_detect():
+@click.option("--no-cache", is_flag=True, help="忽略缓存，重新扫描串口")
+def auto_detect(no_cache: bool):
     """自动检测继电器设备"""
-    with Progress(
-        SpinnerColumn(),
-        TextColumn("[progress.description]{task.description}"),
-        console=console,
-        transient=True,
-    ) as progress:
-        task = progress.add_task("正在自动检测继电器设备...", total=None)
-        device_port = DeviceManager.auto_detect_relay_device()
-        progress.update(task, completed=True)
+    device_port = _run_with_spinner("正在自动检测继电器设备...", DeviceManager.auto_detect_relay_device, not no_cache)
     
     if device_port:
         console.print(f"[green]✓ 检测到继电器设备: {device_port}[/green]")
@@ -154,35 +260,34 @@ def auto_detect():
 @device.command("info")
 @click.option("--port", "-p", required=True, help="设备端口路径")
 @click.option("--slave-id", "-s", default=1, help="从设备地址")
-@handle_exceptions
 def device_info(port: str, slave_id: int):
     """获取设备信息"""
+    from rich.panel import Panel
+    from rich.progress import Progress, SpinnerColumn, TextColumn
+    
     with Progress(
         SpinnerColumn(),
         TextColumn("[progress.description]{task.description}"),
-        console=console,
+        console=_get_console(),
         transient=True,
     ) as progress:
         task = progress.add_task("正在连接设备...", total=None)
         
-        with USBRelayController(port, slave_id) as controller:
-            progress.update(task, description="正在读取设备信息...")
-            
-            # 测试连接
-            is_connected = controller.test_connection()
-            progress.update(task, completed=True)
+        controller = _controller(port, slave_id)
+        progress.update(task, description="正在读取设备信息...")
+        
+        # 测试连接
+        is_connected = controller.test_connection()
+        progress.update(task, completed=True)
     
     # 显示设备信息
     info_panel = Panel.fit(
-        f"""
-[cyan]设备端口:[/cyan] {port}
-[cyan]从设备地址:[/cyan] {slave_id}
-[cyan]连接状态:[/cyan] {'[green]已连接[/green]' if is_connected else '[red]连接失败[/red]'}
-[cyan]波特率:[/cyan] 9600
-[cyan]数据位:[/cyan] 8
-[cyan]停止位:[/cyan] 1
-[cyan]校验位:[/cyan] 无
-        """.strip(),
+        _INFO_TEMPLATE.format_map({
+            "port": port,
+            "slave_id": slave_id,
+            "connection": _CONNECTION_CELL[bool(is_connected)],
+            "baudrate": controller.baudrate,
+        }),
         title="设备信息",
         border_style="blue"
     )
@@ -200,46 +305,43 @@ def relay():
 @click.option("--port", "-p", required=True, help="设备端口路径")
 @click.option("--slave-id", "-s", default=1, help="从设备地址")
 @click.option("--relay", "-r", type=int, help="继电器编号（1-8），不指定则显示所有")
-@click.option("--count", "-c", default=8, help="最大继电器数量")
-@handle_exceptions
+@click.option("--count", "-c", default=8, type=click.IntRange(1, 2000), help="最大继电器数量")
 def relay_status(port: str, slave_id: int, relay: Optional[int], count: int):
     """查看继电器状态"""
-    with USBRelayController(port, slave_id) as controller:
-        if relay is not None:
-            # 显示单个继电器状态
-            state = controller.get_relay_state(relay)
-            status_color = "green" if state.state else "red"
-            status_text = "开启" if state.state else "关闭"
-            console.print(f"继电器 {relay}: [{status_color}]{status_text}[/{status_color}]")
-        else:
-            # 显示所有继电器状态
-            states = controller.get_all_relay_states(count)
-            
-            table = Table(title="继电器状态")
-            table.add_column("继电器", justify="center", style="cyan")
-            table.add_column("状态", justify="center")
-            table.add_column("地址", justify="center", style="yellow")
-            
-            for state in states:
-                status_color = "green" if state.state else "red"
-                status_text = "开启" if state.state else "关闭"
-                table.add_row(
-                    str(state.relay_id),
-                    f"[{status_color}]{status_text}[/{status_color}]",
-                    f"0x{state.address:04X}"
-                )
-            
-            console.print(table)
+    from rich.table import Table
+    
+    controller = _get_controller_or_daemon(port, slave_id)
+    if relay is not None:
+        # 显示单个继电器状态
+        state = controller.get_relay_state(relay)
+        console.print(f"继电器 {relay}: {_RELAY_CELL[state.state]}")
+    else:
+        # 显示所有继电器状态
+        states = controller.get_all_relay_states(count)
+        if count > _PLAIN_OUTPUT_THRESHOLD:
+            _print_plain_states(states, "relay_id")
+            return
+        
+        table = Table(title="继电器状态")
+        table.add_column("继电器", justify="center", style="cyan")
+        table.add_column("状态", justify="center")
+        table.add_column("地址", justify="center", style="yellow")
+        
+        rows = [(str(s.relay_id), _RELAY_CELL[s.state], s.address_hex) for s in states]
+        add_row = table.add_row
+        for row in rows:
+            add_row(*row)
+        
+        console.print(table)
 
 
 @relay.command("on")
 @click.option("--port", "-p", required=True, help="设备端口路径")
 @click.option("--slave-id", "-s", default=1, help="从设备地址")
 @click.option("--relay", "-r", required=True, type=int, multiple=True, help="继电器编号（1-8），可以指定多个")
-@handle_exceptions
 def relay_on(port: str, slave_id: int, relay: List[int]):
     """打开继电器"""
-    from daemon import execute_relay_command_smart
+    execute_relay_command_smart = _daemon().execute_relay_command_smart
     
     success_count = 0
     failed_relays = []
@@ -266,10 +368,9 @@ def relay_on(port: str, slave_id: int, relay: List[int]):
 @click.option("--port", "-p", required=True, help="设备端口路径")
 @click.option("--slave-id", "-s", default=1, help="从设备地址")
 @click.option("--relay", "-r", required=True, type=int, multiple=True, help="继电器编号（1-8），可以指定多个")
-@handle_exceptions
 def relay_off(port: str, slave_id: int, relay: List[int]):
     """关闭继电器"""
-    from daemon import execute_relay_command_smart
+    execute_relay_command_smart = _daemon().execute_relay_command_smart
     
     success_count = 0
     failed_relays = []
@@ -296,10 +397,11 @@ def relay_off(port: str, slave_id: int, relay: List[int]):
 @click.option("--port", "-p", required=True, help="设备端口路径")
 @click.option("--slave-id", "-s", default=1, help="从设备地址")
 @click.option("--relay", "-r", required=True, type=int, multiple=True, help="继电器编号（1-8），可以指定多个")
-@handle_exceptions
 def relay_toggle(port: str, slave_id: int, relay: List[int]):
     """切换继电器状态"""
-    from daemon import DaemonClient, get_status_smart, execute_relay_command_smart
+    daemon_module = _daemon()
+    get_status_smart = daemon_module.get_status_smart
+    execute_relay_command_smart = daemon_module.execute_relay_command_smart
     
     # 先获取当前状态
     try:
@@ -347,79 +449,85 @@ def relay_toggle(port: str, slave_id: int, relay: List[int]):
 @click.option("--port", "-p", required=True, help="设备端口路径")
 @click.option("--slave-id", "-s", default=1, help="从设备地址")
 @click.option("--count", "-c", default=8, help="继电器数量")
-@handle_exceptions
-def relay_all_on(port: str, slave_id: int, count: int):
+@click.option("--yes", "-y", is_flag=True, envvar="USB_RELAY_ASSUME_YES", help="跳过确认（也可设置环境变量USB_RELAY_ASSUME_YES=1）")
+def relay_all_on(port: str, slave_id: int, count: int, yes: bool):
     """打开所有继电器"""
-    if not Confirm.ask(f"确定要打开所有 {count} 个继电器吗？"):
-        console.print("[yellow]操作已取消[/yellow]")
-        return
-    
-    with USBRelayController(port, slave_id) as controller:
-        success = controller.turn_on_all_relays(count)
+    # 非交互环境（脚本、定时任务）没有人能回答确认，直接执行
+    if not yes and sys.stdin.isatty():
+        from rich.prompt import Confirm
         
-        if success:
-            console.print(f"[green]✓ 所有继电器已打开[/green]")
-        else:
-            console.print(f"[red]✗ 批量打开继电器失败[/red]")
+        if not Confirm.ask(f"确定要打开所有 {count} 个继电器吗？"):
+            console.print("[yellow]操作已取消[/yellow]")
+            return
+    
+    controller = _get_controller_or_daemon(port, slave_id)
+    success = controller.turn_on_all_relays(count)
+    
+    if success:
+        console.print(f"[green]✓ 所有继电器已打开[/green]")
+    else:
+        console.print(f"[red]✗ 批量打开继电器失败[/red]")
 
 
 @relay.command("all-off")
 @click.option("--port", "-p", required=True, help="设备端口路径")
 @click.option("--slave-id", "-s", default=1, help="从设备地址")
 @click.option("--count", "-c", default=8, help="继电器数量")
-@handle_exceptions
 def relay_all_off(port: str, slave_id: int, count: int):
     """关闭所有继电器"""
-    with USBRelayController(port, slave_id) as controller:
-        success = controller.turn_off_all_relays(count)
-        
-        if success:
-            console.print(f"[green]✓ 所有继电器已关闭[/green]")
-        else:
-            console.print(f"[red]✗ 批量关闭继电器失败[/red]")
+    controller = _get_controller_or_daemon(port, slave_id)
+    success = controller.turn_off_all_relays(count)
+    
+    if success:
+        console.print(f"[green]✓ 所有继电器已关闭[/green]")
+    else:
+        console.print(f"[red]✗ 批量关闭继电器失败[/red]")
+
+
+def _pulse(sequence, relay_id: int, duration: float) -> bool:
+    """守护进程运行时由其定时关闭继电器（本进程被结束也会关闭），否则在本进程中等待后关闭"""
+    if isinstance(sequence.controller, _daemon().DaemonRelayController):
+        return sequence.controller.pulse_relay(relay_id, duration)
+    return sequence.pulse_relay(relay_id, duration)
 
 
 @relay.command("pulse")
-@click.option("--port", "-p", required=True, help="设备端口路径")
+@click.option("--port", "-p", required=True, multiple=True, help="设备端口路径，可以指定多个以同时脉冲")
 @click.option("--slave-id", "-s", default=1, help="从设备地址")
 @click.option("--relay", "-r", required=True, type=int, help="继电器编号（1-8）")
 @click.option("--duration", "-d", default=1.0, type=float, help="脉冲持续时间（秒）")
-@handle_exceptions
-def relay_pulse(port: str, slave_id: int, relay: int, duration: float):
+def relay_pulse(port: List[str], slave_id: int, relay: int, duration: float):
     """继电器脉冲控制"""
-    with USBRelayController(port, slave_id) as controller:
-        sequence = RelaySequence(controller)
-        
-        console.print(f"[cyan]执行继电器 {relay} 脉冲控制，持续 {duration} 秒...[/cyan]")
-        
-        success = sequence.pulse_relay(relay, duration)
-        
+    console.print(f"[cyan]执行继电器 {relay} 脉冲控制，持续 {duration} 秒...[/cyan]")
+    
+    results = _run_on_ports(port, slave_id, lambda sequence: _pulse(sequence, relay, duration))
+    
+    for device_port, success in zip(port, results):
+        prefix = f"{device_port}: " if len(port) > 1 else ""
         if success:
-            console.print(f"[green]✓ 继电器 {relay} 脉冲控制完成[/green]")
+            console.print(f"[green]✓ {prefix}继电器 {relay} 脉冲控制完成[/green]")
         else:
-            console.print(f"[red]✗ 继电器 {relay} 脉冲控制失败[/red]")
+            console.print(f"[red]✗ {prefix}继电器 {relay} 脉冲控制失败[/red]")
 
 
 @relay.command("running-lights")
-@click.option("--port", "-p", required=True, help="设备端口路径")
+@click.option("--port", "-p", required=True, multiple=True, help="设备端口路径，可以指定多个以同时运行")
 @click.option("--slave-id", "-s", default=1, help="从设备地址")
 @click.option("--count", "-c", default=4, help="继电器数量")
 @click.option("--delay", "-d", default=0.5, type=float, help="每步延时（秒）")
 @click.option("--cycles", default=3, help="循环次数")
-@handle_exceptions
-def running_lights(port: str, slave_id: int, count: int, delay: float, cycles: int):
+def running_lights(port: List[str], slave_id: int, count: int, delay: float, cycles: int):
     """流水灯效果"""
-    with USBRelayController(port, slave_id) as controller:
-        sequence = RelaySequence(controller)
-        
-        console.print(f"[cyan]执行流水灯效果，{count} 个继电器，{cycles} 个循环...[/cyan]")
-        
-        success = sequence.running_lights(count, delay, cycles)
-        
+    console.print(f"[cyan]执行流水灯效果，{count} 个继电器，{cycles} 个循环...[/cyan]")
+    
+    results = _run_on_ports(port, slave_id, lambda sequence: sequence.running_lights(count, delay, cycles))
+    
+    for device_port, success in zip(port, results):
+        prefix = f"{device_port}: " if len(port) > 1 else ""
         if success:
-            console.print(f"[green]✓ 流水灯效果执行完成[/green]")
+            console.print(f"[green]✓ {prefix}流水灯效果执行完成[/green]")
         else:
-            console.print(f"[red]✗ 流水灯效果执行失败[/red]")
+            console.print(f"[red]✗ {prefix}流水灯效果执行失败[/red]")
 
 
 @cli.group()
@@ -432,36 +540,34 @@ def input():
 @click.option("--port", "-p", required=True, help="设备端口路径")
 @click.option("--slave-id", "-s", default=1, help="从设备地址")
 @click.option("--input", "-i", type=int, help="输入编号（1-8），不指定则显示所有")
-@click.option("--count", "-c", default=8, help="最大输入数量")
-@handle_exceptions
+@click.option("--count", "-c", default=8, type=click.IntRange(1, 2000), help="最大输入数量")
 def input_status(port: str, slave_id: int, input: Optional[int], count: int):
     """查看数字量输入状态"""
-    with USBRelayController(port, slave_id) as controller:
-        if input is not None:
-            # 显示单个输入状态
-            state = controller.get_input_state(input)
-            status_color = "green" if state.state else "red"
-            status_text = "高电平" if state.state else "低电平"
-            console.print(f"输入 {input}: [{status_color}]{status_text}[/{status_color}]")
-        else:
-            # 显示所有输入状态
-            states = controller.get_all_input_states(count)
-            
-            table = Table(title="数字量输入状态")
-            table.add_column("输入", justify="center", style="cyan")
-            table.add_column("状态", justify="center")
-            table.add_column("地址", justify="center", style="yellow")
-            
-            for state in states:
-                status_color = "green" if state.state else "red"
-                status_text = "高电平" if state.state else "低电平"
-                table.add_row(
-                    str(state.input_id),
-                    f"[{status_color}]{status_text}[/{status_color}]",
-                    f"0x{state.address:04X}"
-                )
-            
-            console.print(table)
+    from rich.table import Table
+    
+    controller = _get_controller_or_daemon(port, slave_id)
+    if input is not None:
+        # 显示单个输入状态
+        state = controller.get_input_state(input)
+        console.print(f"输入 {input}: {_INPUT_CELL[state.state]}")
+    else:
+        # 显示所有输入状态
+        states = controller.get_all_input_states(count)
+        if count > _PLAIN_OUTPUT_THRESHOLD:
+            _print_plain_states(states, "input_id")
+            return
+        
+        table = Table(title="数字量输入状态")
+        table.add_column("输入", justify="center", style="cyan")
+        table.add_column("状态", justify="center")
+        table.add_column("地址", justify="center", style="yellow")
+        
+        rows = [(str(s.input_id), _INPUT_CELL[s.state], s.address_hex) for s in states]
+        add_row = table.add_row
+        for row in rows:
+            add_row(*row)
+        
+        console.print(table)
 
 
 @input.command("monitor")
@@ -471,149 +577,162 @@ def input_status(port: str, slave_id: int, input: Optional[int], count: int):
 @click.option("--count", "-c", default=4, help="输入数量（默认4路）")
 @click.option("--interval", default=0.5, type=float, help="监控间隔（秒）")
 @click.option("--interactive", "-I", is_flag=True, help="交互式模式，可通过键盘控制继电器")
-@handle_exceptions
 def input_monitor(port: str, slave_id: int, input: Optional[int], count: int, interval: float, interactive: bool):
     """实时监控数字量输入状态"""
+    # 低于Modbus帧间静默+设备响应时间的间隔没有意义，只会空耗CPU（CLI使用默认波特率9600）
+    min_interval = ModbusRTUClient.min_poll_interval(9600)
+    if interval < min_interval:
+        console.print(f"[yellow]监控间隔已提升至 {min_interval:.3f}s[/yellow]")
+        interval = min_interval
+    
     console.print("[cyan]启动守护进程监控模式...[/cyan]")
     console.print(f"[yellow]设备: {port} | 从地址: {slave_id} | 路数: {count}[/yellow]")
     console.print()
     
     # 启动完整的守护进程（包含通信同步机制）
-    from daemon import USBRelayDaemon, DaemonClient
-    import signal
+    daemon_module = _daemon()
     import threading
+    from rich.live import Live
+    from rich.text import Text
     
-    daemon = USBRelayDaemon(port, slave_id, count)
+    # 已有守护进程时直接订阅其状态，避免再次打开串口
+    client = daemon_module.DaemonClient(port)
+    daemon = None
+    if not client.is_daemon_running():
+        daemon = daemon_module.USBRelayDaemon(port, slave_id, count, poll_interval=interval)
     
-    def signal_handler(sig, frame):
+    def stop_monitor():
         print()  # 换行清理当前行
-        daemon.stop()
-        console.print("[green]✓ 监控守护进程已停止[/green]")
-        sys.exit(0)
+        if daemon is not None:
+            daemon.stop()
+            console.print("[green]✓ 监控守护进程已停止[/green]")
     
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
+    _cleanups.append(stop_monitor)
     
     try:
-        # 在后台线程启动完整的守护进程
-        daemon_thread = threading.Thread(target=daemon.start, daemon=True)
-        daemon_thread.start()
-        
-        # 等待守护进程启动
-        time.sleep(2)
-        
-        # 创建客户端来获取状态
-        client = DaemonClient(port)
-        
-        console.print("[green]✓ 守护进程已启动，现在可以在其他终端使用控制命令[/green]")
+        if daemon is None:
+            console.print("[yellow]检测到守护进程正在运行，将直接订阅其状态[/yellow]")
+        else:
+            # 在后台线程启动完整的守护进程
+            daemon_thread = threading.Thread(target=daemon.start, daemon=True)
+            daemon_thread.start()
+            
+            # 等待守护进程完成启动（套接字已开始监听）
+            if not daemon.ready.wait(5.0):
+                raise RuntimeError("守护进程启动超时")
+            if daemon.start_error is not None:
+                raise RuntimeError(f"守护进程启动失败: {daemon.start_error}")
+            
+            console.print("[green]✓ 守护进程已启动，现在可以在其他终端使用控制命令[/green]")
         console.print("[cyan]在新终端中使用以下命令控制继电器:[/cyan]")
         console.print(f"[dim]  python run.py relay toggle -p {port} -r 1[/dim]")
         console.print(f"[dim]  python run.py relay on -p {port} -r 2[/dim]")
         console.print(f"[dim]  python run.py relay status -p {port}[/dim]")
         console.print()
         
-        # 主监控循环
+        # 主监控循环：Live只在收到新状态时更新显示，变化前的状态行保留在上方
         prev_relay_states = None
         prev_input_states = None
-        last_print_was_newline = False  # 追踪上次是否换行打印
+        prev_line = None
         
-        while daemon.running:
-            current_time = time.strftime("%H:%M:%S")
-            
+        # 订阅守护进程状态推送：仅在状态变化时收到新帧，无需定时轮询
+        # 关闭自动刷新，只在内容变化时写终端，状态稳定时不产生任何输出
+        # 内嵌守护进程直接通过进程内队列接收状态，外部守护进程则通过套接字订阅
+        if daemon is None:
+            statuses = client.subscribe()
+        else:
+            statuses = iter(daemon.subscribe_local().get, None)
+        
+        # 预先生成每一路在两种状态下的显示片段，刷新时只需按布尔值索引
+        relay_cells = [tuple(f"R{i+1}{glyph}" for glyph in _STATE_GLYPHS) for i in range(count)]
+        input_cells = [tuple(f"I{i+1}{glyph}" for glyph in _STATE_GLYPHS) for i in range(count)]
+        
+        with Live(console=_get_console(), auto_refresh=False) as live:
             try:
-                # 通过客户端获取状态
-                status = client.get_status()
-                
-                if status.get("success"):
-                    relay_states = status.get("relay_states", [False] * count)
-                    input_states = status.get("input_states", [False] * count)
-                    
-                    # 检查状态是否发生变化
-                    states_changed = (
-                        prev_relay_states is not None and 
-                        (prev_relay_states != relay_states or prev_input_states != input_states)
-                    )
-                    
-                    # 构建状态显示
-                    relay_status = []
-                    for i in range(count):
-                        state = "●" if (i < len(relay_states) and relay_states[i]) else "○"
-                        relay_status.append(f"R{i+1}{state}")
-                    
-                    input_status = []
-                    for i in range(count):
-                        state = "●" if (i < len(input_states) and input_states[i]) else "○"
-                        input_status.append(f"I{i+1}{state}")
-                    
-                    status_line = f"[{current_time}] 继电器: {' '.join(relay_status)} | 输入: {' '.join(input_status)}"
-                    
-                    if states_changed:
-                        # 状态发生变化
-                        if not last_print_was_newline:
-                            # 如果上次是覆盖打印，先换行保留上一行
-                            print()
-                        print(status_line, end="", flush=True)
-                        last_print_was_newline = True
+                for status in statuses:
+                    if status.get("success"):
+                        relay_states = status.get("relay_states", [False] * count)
+                        input_states = status.get("input_states", [False] * count)
+                        
+                        if relay_states == prev_relay_states and input_states == prev_input_states:
+                            continue
+                        
+                        # 只在需要输出新状态行时才格式化时间
+                        current_time = time.strftime("%H:%M:%S")
+                        
+                        # 构建状态显示（按布尔值索引预置的显示片段）
+                        relay_status = " ".join(
+                            cells[i < len(relay_states) and relay_states[i]]
+                            for i, cells in enumerate(relay_cells)
+                        )
+                        input_status = " ".join(
+                            cells[i < len(input_states) and input_states[i]]
+                            for i, cells in enumerate(input_cells)
+                        )
+                        status_line = f"[{current_time}] 继电器: {relay_status} | 输入: {input_status}"
+                        
+                        # 状态发生变化时保留上一行
+                        if prev_line is not None:
+                            live.console.print(prev_line)
+                        live.update(Text.from_markup(status_line), refresh=True)
+                        prev_line = status_line
+                        
+                        # 更新前一次的状态
+                        prev_relay_states = relay_states[:]
+                        prev_input_states = input_states[:]
+                        
                     else:
-                        # 状态无变化，覆盖当前行
-                        print(f"\r{status_line}", end="", flush=True)
-                        last_print_was_newline = False
-                    
-                    # 更新前一次的状态
-                    prev_relay_states = relay_states[:]
-                    prev_input_states = input_states[:]
-                    
-                else:
-                    error_msg = f"[{current_time}] 状态获取失败: {status.get('error', '未知错误')}"
-                    print(f"\r{error_msg}", end="", flush=True)
-                    last_print_was_newline = False
-                    
+                        current_time = time.strftime("%H:%M:%S")
+                        error_msg = f"[{current_time}] 状态获取失败: {status.get('error', '未知错误')}"
+                        live.update(Text(error_msg, style="red"), refresh=True)
+                        
             except Exception as e:
-                error_msg = f"[{current_time}] 通信错误: {e}"
-                print(f"\r{error_msg}", end="", flush=True)
-                last_print_was_newline = False
-            
-            time.sleep(interval)
+                if daemon is None or daemon.running:
+                    live.update(Text(f"[{time.strftime('%H:%M:%S')}] 通信错误: {e}", style="red"), refresh=True)
     
     except Exception as e:
         # 先换行，再输出错误信息
         print()  # 换行
         console.print(f"[red]监控启动失败: {e}[/red]")
-        daemon.stop()
+        if daemon is not None:
+            daemon.stop()
 
 
 @cli.command("daemon")
 @click.option("--port", "-p", required=True, help="设备端口路径")
 @click.option("--slave-id", "-s", default=1, help="从设备地址")
 @click.option("--count", "-c", default=4, help="继电器/输入数量")
-@handle_exceptions
 def start_daemon(port: str, slave_id: int, count: int):
     """启动守护进程模式"""
-    from daemon import USBRelayDaemon
-    import signal
-    
-    daemon = USBRelayDaemon(port, slave_id, count)
-    
-    def signal_handler(sig, frame):
-        daemon.stop()
-        sys.exit(0)
+    daemon_module = _daemon()
+    stop_logging = daemon_module.start_log_listener()
+    daemon = daemon_module.USBRelayDaemon(port, slave_id, count)
+    _cleanups.append(daemon.stop)
     
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
-    daemon.start()
+    try:
+        daemon.start()
+    finally:
+        stop_logging()
+
+
+def _wait_relay_state(controller, relay_id: int, expected: bool, timeout: float = 0.2):
+    """轮询继电器状态直到与期望值一致或超时，返回最后一次读取的状态"""
+    deadline = time.monotonic() + timeout
+    state = controller.get_relay_state(relay_id)
+    while state.state != expected and time.monotonic() < deadline:
+        state = controller.get_relay_state(relay_id)
+    return state
 
 
 @cli.command("test")
 @click.option("--port", "-p", required=True, help="设备端口路径")
 @click.option("--slave-id", "-s", default=1, help="从设备地址")
-@handle_exceptions
 def test_device(port: str, slave_id: int):
     """测试设备功能"""
     console.print("[cyan]开始设备功能测试...[/cyan]")
     
     # 检查是否有守护进程运行
-    daemon_client = DaemonClient(port)
+    daemon_client = _daemon().get_daemon_client(port)
     if daemon_client.is_daemon_running():
         console.print("[yellow]检测到守护进程正在运行，将通过守护进程进行测试[/yellow]")
         
@@ -626,8 +745,8 @@ def test_device(port: str, slave_id: int):
             
             # 测试继电器控制
             console.print("测试继电器控制...")
+            # set_relay在从设备应答写入后才返回，无需额外等待
             success1 = daemon_client.set_relay(1, True)
-            time.sleep(0.5)
             success2 = daemon_client.set_relay(1, False)
             
             if success1 and success2:
@@ -642,43 +761,41 @@ def test_device(port: str, slave_id: int):
     
     else:
         # 直接模式测试
-        with USBRelayController(port, slave_id) as controller:
-            # 测试连接
-            console.print("1. 测试设备连接...")
-            if controller.test_connection():
-                console.print("[green]   ✓ 设备连接正常[/green]")
-            else:
-                console.print("[red]   ✗ 设备连接失败[/red]")
-                return
+        controller = _controller(port, slave_id)
+        # 测试连接
+        console.print("1. 测试设备连接...")
+        if controller.test_connection():
+            console.print("[green]   ✓ 设备连接正常[/green]")
+        else:
+            console.print("[red]   ✗ 设备连接失败[/red]")
+            return
+        
+        # 测试继电器控制
+        console.print("2. 测试继电器控制...")
+        try:
+            # 测试单个继电器（写入应答后即可回读，_wait_relay_state只为兼容响应慢的设备）
+            controller.turn_on_relay(1)
+            state1 = _wait_relay_state(controller, 1, True)
             
-            # 测试继电器控制
-            console.print("2. 测试继电器控制...")
-            try:
-                # 测试单个继电器
-                controller.turn_on_relay(1)
-                time.sleep(0.5)
-                state1 = controller.get_relay_state(1)
-                
-                controller.turn_off_relay(1)
-                time.sleep(0.5)
-                state2 = controller.get_relay_state(1)
-                
-                if state1.state and not state2.state:
-                    console.print("[green]   ✓ 继电器控制正常[/green]")
-                else:
-                    console.print("[red]   ✗ 继电器控制异常[/red]")
-            except Exception as e:
-                console.print(f"[red]   ✗ 继电器测试失败: {e}[/red]")
+            controller.turn_off_relay(1)
+            state2 = _wait_relay_state(controller, 1, False)
             
-            # 测试数字量输入
-            console.print("3. 测试数字量输入...")
-            try:
-                inputs = controller.get_all_input_states(4)
-                console.print(f"[green]   ✓ 成功读取 {len(inputs)} 个输入状态[/green]")
-            except Exception as e:
-                console.print(f"[red]   ✗ 数字量输入测试失败: {e}[/red]")
-            
-            console.print("[green]设备功能测试完成[/green]")
+            if state1.state and not state2.state:
+                console.print("[green]   ✓ 继电器控制正常[/green]")
+            else:
+                console.print("[red]   ✗ 继电器控制异常[/red]")
+        except Exception as e:
+            console.print(f"[red]   ✗ 继电器测试失败: {e}[/red]")
+        
+        # 测试数字量输入
+        console.print("3. 测试数字量输入...")
+        try:
+            inputs = controller.get_all_input_states(4)
+            console.print(f"[green]   ✓ 成功读取 {len(inputs)} 个输入状态[/green]")
+        except Exception as e:
+            console.print(f"[red]   ✗ 数字量输入测试失败: {e}[/red]")
+        
+        console.print("[green]设备功能测试完成[/green]")
 
 
 if __name__ == "__main__":
@@ -9,10 +9,115 @@
 
 import os
 import json
-import yaml
+import functools
 from typing import Dict, Any, Optional, List
 from pathlib import Path
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, fields
+
+# 保存配置时复用的JSON编码器，避免每次保存重新构建
+_JSON_ENCODE = json.JSONEncoder(indent=2, ensure_ascii=False).encode
+
+# orjson为可选依赖，安装后JSON配置的读写使用其C实现
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+@functools.lru_cache(maxsize=1)
+def _yaml():
+    """
+    延迟导入PyYAML（结果缓存），只读写JSON配置时不加载。
+    返回(yaml模块, 加载器, 输出参数)，优先使用libyaml的C实现，未编译libyaml时回退到纯Python实现
+    """
+    import yaml
+    try:
+        from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+    except ImportError:
+        from yaml import SafeLoader, SafeDumper
+    dump_kw = dict(Dumper=SafeDumper, default_flow_style=False, allow_unicode=True,
+                   indent=2, sort_keys=False)
+    return yaml, SafeLoader, dump_kw
+
+
+def _yaml_load(stream) -> Any:
+    """解析YAML文本或文件"""
+    yaml, loader, _ = _yaml()
+    return yaml.load(stream, Loader=loader)
+
+
+def _yaml_dump(data: Any, f) -> None:
+    """以块格式把数据写入YAML文件"""
+    yaml, _, dump_kw = _yaml()
+    yaml.dump(data, f, **dump_kw)
+
+
+# 已解析配置文件的缓存 {路径: (mtime_ns, 文件大小, 解析结果)}，文件未变化时跳过重新解析
+_PARSED_CACHE: Dict[str, tuple] = {}
+
+
+def _load_file(path: Path, format: str = "yaml") -> Any:
+    """读取并解析配置文件，文件的修改时间和大小未变时直接返回缓存结果"""
+    key = str(path)
+    stat = os.stat(key)
+    cached = _PARSED_CACHE.get(key)
+    if cached is not None and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        return cached[2]
+    
+    if format == "json" and orjson is not None:
+        with open(path, 'rb') as f:
+            data = orjson.loads(f.read())
+    else:
+        with open(path, 'r', encoding='utf-8') as f:
+            if format == "json":
+                data = json.load(f)
+            else:  # yaml
+                data = _yaml_load(f)
+    
+    _PARSED_CACHE[key] = (stat.st_mtime_ns, stat.st_size, data)
+    return data
+
+
+def _read_profile_meta(path: Path) -> Dict[str, Any]:
+    """
+    只解析档案文件顶层的name/description两项，跳过体积较大的config子树；
+    两项未能找到时回退为完整解析
+    """
+    wanted = ("name:", "description:")
+    snippet = []
+    found = 0
+    in_wanted = False
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line[:1].isspace():
+                # 顶层键开始，档案由yaml.dump以块格式写出，顶层键都在行首
+                if found == len(wanted):
+                    break  # 两项均已读完（新档案中它们位于config之前）
+                in_wanted = line.startswith(wanted)
+                found += in_wanted
+            if in_wanted:
+                snippet.append(line)
+    
+    meta = _yaml_load("".join(snippet)) if snippet else None
+    if isinstance(meta, dict) and "name" in meta and "description" in meta:
+        return meta
+    return _load_file(path)
+
+
+def _write_json(path: Path, data: Any) -> None:
+    """写入JSON文件（安装了orjson时使用其C实现）"""
+    if orjson is not None:
+        with open(path, 'wb') as f:
+            f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+    else:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(_JSON_ENCODE(data))
+
+
+def _remember_file(path: Path, data: Any) -> None:
+    """写入文件后用刚写入的内容更新缓存，下次读取无需重新解析"""
+    stat = os.stat(path)
+    _PARSED_CACHE[str(path)] = (stat.st_mtime_ns, stat.st_size, data)
 
 
 @dataclass
@@ -58,10 +163,25 @@ class AppConfig:
         self.ui = UIConfig()
 
 
+# 各配置段的字段名集合，更新和加载配置时据此过滤未知字段，无需逐个hasattr
+_SERIAL_FIELDS = frozenset(f.name for f in fields(SerialConfig))
+_DEVICE_FIELDS = frozenset(f.name for f in fields(DeviceConfig))
+_UI_FIELDS = frozenset(f.name for f in fields(UIConfig))
+
+# 配置文件中的段名 -> (配置类, 字段名集合)
+_SECTIONS = {
+    "serial": (SerialConfig, _SERIAL_FIELDS),
+    "device": (DeviceConfig, _DEVICE_FIELDS),
+    "ui": (UIConfig, _UI_FIELDS),
+}
+
+
 class ConfigManager:
     """配置管理器"""
     
     DEFAULT_CONFIG_NAME = "usb_relay_config"
+    # 默认使用JSON保存（读写比YAML快得多），手工编辑的YAML配置仍会被自动识别
+    DEFAULT_FORMAT = "json"
     SUPPORTED_FORMATS = ["json", "yaml", "yml"]
     
     def __init__(self, config_dir: Optional[str] = None):
@@ -74,6 +194,14 @@ class ConfigManager:
         self.config_dir = Path(config_dir) if config_dir else self._get_default_config_dir()
         self.config_dir.mkdir(parents=True, exist_ok=True)
         self.config = AppConfig()
+        
+        # 各格式的配置文件路径固定不变，预先构建一次
+        self._paths = {
+            fmt: self.config_dir / f"{self.DEFAULT_CONFIG_NAME}.{fmt}"
+            for fmt in self.SUPPORTED_FORMATS
+        }
+        self._paths_str = {fmt: os.fspath(path) for fmt, path in self._paths.items()}
+        self._file_formats = {path.name: fmt for fmt, path in self._paths.items()}
     
     def _get_default_config_dir(self) -> Path:
         """获取默认配置目录"""
@@ -85,14 +213,15 @@ class ConfigManager:
         
         return config_dir
     
-    def _get_config_file_path(self, format: str = "yaml") -> Path:
+    def _resolve_format(self, format: str) -> str:
+        """不支持的格式回退为默认格式，文件路径和读写方式都以此为准"""
+        return format if format in self._paths else self.DEFAULT_FORMAT
+    
+    def _get_config_file_path(self, format: str = DEFAULT_FORMAT) -> Path:
         """获取配置文件路径"""
-        if format not in self.SUPPORTED_FORMATS:
-            format = "yaml"
-        
-        return self.config_dir / f"{self.DEFAULT_CONFIG_NAME}.{format}"
+        return self._paths[self._resolve_format(format)]
     
-    def load_config(self, format: str = "yaml") -> bool:
+    def load_config(self, format: str = DEFAULT_FORMAT) -> bool:
         """
         加载配置文件
         
@@ -102,26 +231,26 @@ class ConfigManager:
         Returns:
             bool: 是否加载成功
         """
-        config_file = self._get_config_file_path(format)
+        # 一次扫描配置目录找出所有已存在的配置文件，无需逐个格式stat
+        with os.scandir(self.config_dir) as entries:
+            found = {
+                self._file_formats[entry.name]: entry.path
+                for entry in entries if entry.name in self._file_formats
+            }
         
-        if not config_file.exists():
+        if format not in found:
             # 尝试其他格式
             for fmt in self.SUPPORTED_FORMATS:
-                test_file = self._get_config_file_path(fmt)
-                if test_file.exists():
-                    config_file = test_file
+                if fmt in found:
                     format = fmt
                     break
             else:
                 # 没有找到配置文件，使用默认配置
                 return False
+        config_file = found[format]
         
         try:
-            with open(config_file, 'r', encoding='utf-8') as f:
-                if format == "json":
-                    data = json.load(f)
-                else:  # yaml
-                    data = yaml.safe_load(f)
+            data = _load_file(config_file, format)
             
             # 更新配置对象
             self._update_config_from_dict(data)
@@ -131,7 +260,7 @@ class ConfigManager:
             print(f"加载配置文件失败: {e}")
             return False
     
-    def save_config(self, format: str = "yaml") -> bool:
+    def save_config(self, format: str = DEFAULT_FORMAT) -> bool:
         """
         保存配置文件
         
@@ -141,18 +270,19 @@ class ConfigManager:
         Returns:
             bool: 是否保存成功
         """
-        config_file = self._get_config_file_path(format)
+        format = self._resolve_format(format)
+        config_file = self._paths[format]
         
         try:
             config_dict = self._config_to_dict()
             
-            with open(config_file, 'w', encoding='utf-8') as f:
-                if format == "json":
-                    json.dump(config_dict, f, indent=2, ensure_ascii=False)
-                else:  # yaml
-                    yaml.dump(config_dict, f, default_flow_style=False, 
-                             allow_unicode=True, indent=2)
+            if format == "json":
+                _write_json(config_file, config_dict)
+            else:  # yaml
+                with open(config_file, 'w', encoding='utf-8') as f:
+                    _yaml_dump(config_dict, f)
             
+            _remember_file(config_file, config_dict)
             return True
             
         except Exception as e:
@@ -160,26 +290,20 @@ class ConfigManager:
             return False
     
     def _config_to_dict(self) -> Dict[str, Any]:
-        """将配置对象转换为字典"""
+        """将配置对象转换为字典（各配置类只有标量字段，浅复制即可，无需asdict深复制）"""
         return {
-            "serial": asdict(self.config.serial),
-            "device": asdict(self.config.device),
-            "ui": asdict(self.config.ui)
+            "serial": vars(self.config.serial).copy(),
+            "device": vars(self.config.device).copy(),
+            "ui": vars(self.config.ui).copy()
         }
     
     def _update_config_from_dict(self, data: Dict[str, Any]) -> None:
-        """从字典更新配置对象"""
-        if "serial" in data:
-            serial_data = data["serial"]
-            self.config.serial = SerialConfig(**serial_data)
-        
-        if "device" in data:
-            device_data = data["device"]
-            self.config.device = DeviceConfig(**device_data)
-        
-        if "ui" in data:
-            ui_data = data["ui"]
-            self.config.ui = UIConfig(**ui_data)
+        """从字典更新配置对象（忽略未知字段）"""
+        for section, (config_cls, known) in _SECTIONS.items():
+            section_data = data.get(section)
+            if section_data is not None:
+                setattr(self.config, section, config_cls(
+                    **{k: v for k, v in section_data.items() if k in known}))
     
     def get_serial_config(self) -> SerialConfig:
         """获取串口配置"""
@@ -195,31 +319,28 @@ class ConfigManager:
     
     def update_serial_config(self, **kwargs) -> None:
         """更新串口配置"""
-        for key, value in kwargs.items():
-            if hasattr(self.config.serial, key):
-                setattr(self.config.serial, key, value)
+        vars(self.config.serial).update(
+            (key, value) for key, value in kwargs.items() if key in _SERIAL_FIELDS)
     
     def update_device_config(self, **kwargs) -> None:
         """更新设备配置"""
-        for key, value in kwargs.items():
-            if hasattr(self.config.device, key):
-                setattr(self.config.device, key, value)
+        vars(self.config.device).update(
+            (key, value) for key, value in kwargs.items() if key in _DEVICE_FIELDS)
     
     def update_ui_config(self, **kwargs) -> None:
         """更新界面配置"""
-        for key, value in kwargs.items():
-            if hasattr(self.config.ui, key):
-                setattr(self.config.ui, key, value)
+        vars(self.config.ui).update(
+            (key, value) for key, value in kwargs.items() if key in _UI_FIELDS)
     
     def reset_to_defaults(self) -> None:
         """重置为默认配置"""
         self.config = AppConfig()
     
-    def get_config_file_path(self, format: str = "yaml") -> str:
+    def get_config_file_path(self, format: str = DEFAULT_FORMAT) -> str:
         """获取配置文件路径字符串"""
-        return str(self._get_config_file_path(format))
+        return self._paths_str[self._resolve_format(format)]
     
-    def config_exists(self, format: str = "yaml") -> bool:
+    def config_exists(self, format: str = DEFAULT_FORMAT) -> bool:
         """检查配置文件是否存在"""
         return self._get_config_file_path(format).exists()
 
@@ -238,6 +359,13 @@ class ProfileManager:
         self.profiles_dir = config_manager.config_dir / "profiles"
         self.profiles_dir.mkdir(exist_ok=True)
     
+    def _sidecar_path(self, name: str) -> Path:
+        """
+        档案config部分的JSON副本路径：YAML档案仍是可手工编辑的原始文件，
+        加载档案时优先读取解析更快的JSON副本
+        """
+        return self.profiles_dir / f"{name}.config.json"
+    
     def save_profile(self, name: str, description: str = "") -> bool:
         """
         保存当前配置为档案
@@ -260,9 +388,13 @@ class ProfileManager:
             }
             
             with open(profile_file, 'w', encoding='utf-8') as f:
-                yaml.dump(profile_data, f, default_flow_style=False, 
-                         allow_unicode=True, indent=2)
+                _yaml_dump(profile_data, f)
+            _remember_file(profile_file, profile_data)
             
+            # 副本在YAML之后写入，修改时间不早于档案本身
+            sidecar = self._sidecar_path(name)
+            _write_json(sidecar, profile_data["config"])
+            _remember_file(sidecar, profile_data["config"])
             return True
             
         except Exception as e:
@@ -281,12 +413,22 @@ class ProfileManager:
         """
         profile_file = self.profiles_dir / f"{name}.yaml"
         
-        if not profile_file.exists():
+        try:
+            profile_stat = os.stat(profile_file)
+        except OSError:
             return False
         
         try:
-            with open(profile_file, 'r', encoding='utf-8') as f:
-                profile_data = yaml.safe_load(f)
+            # JSON副本不早于YAML档案时直接使用（档案被手工修改过则回退为解析YAML）
+            sidecar = self._sidecar_path(name)
+            try:
+                if os.stat(sidecar).st_mtime_ns >= profile_stat.st_mtime_ns:
+                    self.config_manager._update_config_from_dict(_load_file(sidecar, "json"))
+                    return True
+            except (OSError, ValueError):
+                pass  # 旧档案没有副本或副本损坏
+            
+            profile_data = _load_file(profile_file)
             
             if "config" in profile_data:
                 self.config_manager._update_config_from_dict(profile_data["config"])
@@ -309,8 +451,7 @@ class ProfileManager:
         
         for profile_file in self.profiles_dir.glob("*.yaml"):
             try:
-                with open(profile_file, 'r', encoding='utf-8') as f:
-                    profile_data = yaml.safe_load(f)
+                profile_data = _read_profile_meta(profile_file)
                 
                 profiles.append({
                     "name": profile_data.get("name", profile_file.stem),
@@ -338,6 +479,12 @@ class ProfileManager:
         if profile_file.exists():
             try:
                 profile_file.unlink()
+                _PARSED_CACHE.pop(str(profile_file), None)
+                
+                sidecar = self._sidecar_path(name)
+                if sidecar.exists():
+                    sidecar.unlink()
+                _PARSED_CACHE.pop(str(sidecar), None)
                 return True
             except Exception:
                 return False
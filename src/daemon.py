@@ -9,58 +9,273 @@ USB继电器RTU守护进程模块
 """
 
 import json
+import logging
+import queue
+import selectors
 import socket
+import stat
+import struct
 import threading
 import time
 import platform
-from typing import Dict, Any, Optional
+from typing import Callable, Dict, Any, Iterator, List, Optional
 from pathlib import Path
 import tempfile
 import os
 import signal
 import sys
+import functools
+import heapq
+import itertools
 
 try:
-    from .device_controller import USBRelayController
+    from .device_controller import USBRelayController, RelayState, InputState
     from .modbus_rtu import ModbusRTUException
 except ImportError:
-    from device_controller import USBRelayController
+    from device_controller import USBRelayController, RelayState, InputState
     from modbus_rtu import ModbusRTUException
 
 
+logger = logging.getLogger("usb_relay_rtu.daemon")
+
+
+# orjson/msgspec为可选依赖，安装后IPC消息的编解码使用其C实现；
+# 线上格式始终是JSON，装有不同依赖的客户端和守护进程之间仍可互通
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+    try:
+        import msgspec
+        _dumps = msgspec.json.Encoder().encode
+        _loads = msgspec.json.Decoder().decode
+    except ImportError:
+        def _dumps(obj: Any) -> bytes:
+            return json.dumps(obj, ensure_ascii=False).encode()
+        _loads = json.loads
+
+# IPC消息格式：4字节大端长度 + JSON正文，任意长度的消息都能完整收发
+_HEADER = struct.Struct(">I")
+
+
+def _encode_message(obj: Any) -> bytes:
+    """编码一条带长度前缀的消息"""
+    body = _dumps(obj)
+    return _HEADER.pack(len(body)) + body
+
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes:
+    """从套接字读取恰好size字节，对端关闭连接时抛出ConnectionError"""
+    buf = bytearray()
+    while len(buf) < size:
+        chunk = sock.recv(size - len(buf))
+        if not chunk:
+            raise ConnectionError("连接已关闭")
+        buf += chunk
+    return bytes(buf)
+
+
+def _recv_frame(sock: socket.socket) -> bytes:
+    """读取一条带长度前缀的消息，返回未解码的正文"""
+    (size,) = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return _recv_exact(sock, size)
+
+
+def _recv_message(sock: socket.socket) -> Any:
+    """读取并解码一条带长度前缀的JSON消息"""
+    return _loads(_recv_frame(sock))
+
+
+# 最常用命令的定长二进制正文，首字节为操作码，收发都无需JSON编解码。
+# JSON正文总以"{"开头，两种正文在同一连接上可以共存
+_OP_SET_RELAY = 1
+_OP_PULSE_RELAY = 2
+_OP_GET_STATUS = 3
+_SET_RELAY_REQ = struct.Struct(">BHb")    # 操作码, 继电器编号, 状态(1开/0关/-1切换)
+_PULSE_RELAY_REQ = struct.Struct(">BHd")  # 操作码, 继电器编号, 持续时间
+_RESULT_RESP = struct.Struct(">BB")       # 操作码, 是否成功（失败且带错误信息时改用JSON应答）
+_STATUS_RESP = struct.Struct(">BHd")      # 操作码, 路数, 更新时间，其后为继电器和输入的位掩码（各(路数+7)//8字节，小端）
+_GET_STATUS_FRAME = _HEADER.pack(1) + bytes([_OP_GET_STATUS])
+
+
+def _decode_binary_request(body: bytearray) -> Dict[str, Any]:
+    """把二进制请求正文解码为与JSON请求相同的字典，binary字段记录应答所用的操作码"""
+    op = body[0]
+    if op == _OP_SET_RELAY:
+        _, relay_id, state = _SET_RELAY_REQ.unpack(body)
+        return {"command": "set_relay", "relay_id": relay_id,
+                "state": None if state < 0 else bool(state), "binary": op}
+    if op == _OP_PULSE_RELAY:
+        _, relay_id, duration = _PULSE_RELAY_REQ.unpack(body)
+        return {"command": "pulse_relay", "relay_id": relay_id, "duration": duration, "binary": op}
+    if op == _OP_GET_STATUS:
+        return {"command": "get_status", "binary": op}
+    raise ValueError(f"未知操作码: {op}")
+
+
+def _encode_binary_status(relay_mask: int, input_mask: int, count: int, last_update: float) -> bytes:
+    """编码二进制状态应答（含长度前缀）"""
+    size = (count + 7) // 8
+    body = (_STATUS_RESP.pack(_OP_GET_STATUS, count, last_update)
+            + relay_mask.to_bytes(size, "little") + input_mask.to_bytes(size, "little"))
+    return _HEADER.pack(len(body)) + body
+
+
+def _decode_binary_response(body: bytes) -> Dict[str, Any]:
+    """解码二进制应答正文"""
+    if body[0] == _OP_GET_STATUS:
+        _, count, last_update = _STATUS_RESP.unpack_from(body)
+        size = (count + 7) // 8
+        offset = _STATUS_RESP.size
+        relay_mask = int.from_bytes(body[offset:offset + size], "little")
+        input_mask = int.from_bytes(body[offset + size:offset + 2 * size], "little")
+        return {
+            "success": True,
+            "relay_states": _mask_to_states(relay_mask, count),
+            "input_states": _mask_to_states(input_mask, count),
+            "count": count,
+            "last_update": last_update
+        }
+    _, success = _RESULT_RESP.unpack(body)
+    return {"success": bool(success)}
+
+
+def _states_to_mask(states) -> int:
+    """把布尔状态序列打包为整数位掩码（第1路对应最低位）"""
+    mask = 0
+    for i, state in enumerate(states):
+        if state:
+            mask |= 1 << i
+    return mask
+
+
+def _mask_to_states(mask: int, count: int) -> List[bool]:
+    """把整数位掩码展开为count个布尔状态"""
+    return [(mask >> i) & 1 == 1 for i in range(count)]
+
+
+def _expand_status(status: Dict[str, Any]) -> Dict[str, Any]:
+    """把守护进程发来的位掩码状态展开为relay_states/input_states列表"""
+    if "relay_mask" in status:
+        count = status.get("count", 0)
+        status["relay_states"] = _mask_to_states(status["relay_mask"], count)
+        status["input_states"] = _mask_to_states(status["input_mask"], count)
+    return status
+
+
+# 平台和临时目录在进程内不会改变，只检测一次
+_IS_WINDOWS = platform.system().lower() == "windows"
+_TMPDIR = tempfile.gettempdir()
+
+
+@functools.lru_cache(maxsize=64)
+def _socket_path(port: str) -> str:
+    """设备端口对应的Unix套接字路径（Linux/macOS）"""
+    return os.path.join(_TMPDIR, f"usb_relay_daemon_{port.replace('/', '_')}.sock")
+
+
+def _log_file_path(port: str) -> str:
+    """后台启动的守护进程的日志文件路径（标准输出和标准错误都写入此文件）"""
+    return os.path.join(_TMPDIR, f"usb_relay_daemon_{port.replace('/', '_').replace(':', '_')}.log")
+
+
+@functools.lru_cache(maxsize=64)
+def _lock_file_path(port: str) -> Path:
+    """设备端口对应的锁文件路径（Windows，记录守护进程的TCP端口）"""
+    return Path(_TMPDIR, f"usb_relay_daemon_{port.replace('/', '_').replace(':', '_')}.lock")
+
+
+# 单个连接允许积压的待发送数据上限，超过说明订阅者长时间不读取，直接断开
+_MAX_PENDING_OUTPUT = 1 << 20
+
+
+class _Connection:
+    """选择器循环中的一个客户端连接"""
+    
+    __slots__ = ("sock", "inbuf", "outbuf", "subscribed")
+    
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.inbuf = bytearray()
+        self.outbuf = bytearray()
+        self.subscribed = False
+
+
 class USBRelayDaemon:
     """USB继电器守护进程 - 跨平台兼容版本"""
     
-    def __init__(self, port: str, slave_id: int = 1, count: int = 4):
+    # 超过IDLE_AFTER秒没有客户端请求且没有订阅者时，状态刷新间隔逐次加倍，最长MAX_IDLE_POLL_INTERVAL秒
+    IDLE_AFTER = 10.0
+    MAX_IDLE_POLL_INTERVAL = 30.0
+    # 停止时等待工作线程关闭脉冲中继电器的最长时间（秒）
+    STOP_TIMEOUT = 5.0
+    
+    def __init__(self, port: str, slave_id: int = 1, count: int = 4, poll_interval: float = 0.5):
         self.port = port
         self.slave_id = slave_id
         self.count = count
+        self.poll_interval = poll_interval
         self.controller: Optional[USBRelayController] = None
         self.running = False
+        # 套接字开始监听后置位，供同进程内的调用者等待启动完成
+        self.ready = threading.Event()
+        # 启动失败的原因；失败时同样置位ready，等待启动的线程无需等到超时
+        self.start_error: Optional[Exception] = None
         
         # 跨平台IPC通信方式
-        self.is_windows = platform.system().lower() == "windows"
+        self.is_windows = _IS_WINDOWS
         
         if self.is_windows:
             # Windows: 使用TCP套接字
             self.tcp_port = self._find_free_port()
             self.socket_path = f"127.0.0.1:{self.tcp_port}"
-            self.lock_file_path = Path(tempfile.gettempdir()) / f"usb_relay_daemon_{port.replace('/', '_').replace(':', '_')}.lock"
+            self.lock_file_path = _lock_file_path(port)
         else:
             # Linux/macOS: 使用Unix套接字
-            self.socket_path = str(Path(tempfile.gettempdir()) / f"usb_relay_daemon_{port.replace('/', '_')}.sock")
+            self.socket_path = _socket_path(port)
             self.lock_file_path = None
             
         self.server_socket = None
         
-        # 串口访问锁
-        self.serial_lock = threading.Lock()
+        # 状态缓存快照 (继电器状态, 输入状态, 更新时间)，元组不可变，
+        # 后台线程整体替换引用，读取方直接取引用即可，无需加锁和复制
+        self._status_snapshot = ((False,) * count, (False,) * count, 0)
+        # get_status响应的编码结果（JSON和二进制两种），随快照一同更新，请求和推送时直接发送
+        self._encode_status()
+        
+        # 同进程状态订阅者（状态变化时主动推送，无需轮询）；套接字订阅者记录在连接上
+        self.local_subscribers = []
+        self.subscribers_lock = threading.Lock()
+        self._socket_subscribers = 0  # 套接字订阅连接数，仅由选择器线程修改
+        
+        # 最近一次客户端请求的时间（选择器线程写入）和当前空闲刷新间隔（工作线程使用）
+        self._last_request = time.monotonic()
+        self._idle_interval = poll_interval
+        
+        # 所有套接字I/O都在选择器线程中完成；串口只由工作线程访问，
+        # 它按到达顺序执行命令，空闲时定时刷新状态，无需串口锁。
+        # 执行结果和状态推送经_outbox交回选择器线程发送
+        self._selector: Optional[selectors.BaseSelector] = None
+        self._connections = set()
+        self._commands = queue.SimpleQueue()
+        self._outbox = queue.SimpleQueue()
+        self._wakeup_r: Optional[socket.socket] = None
+        self._wakeup_w: Optional[socket.socket] = None
+        # 选择器线程共用的接收缓冲区，recv_into直接写入，避免每次接收分配新对象
+        self._rxbuf = memoryview(bytearray(65536))
+        
+        # 脉冲的延时关闭 [(到期时间, 序号, 连接, 继电器编号)] 小顶堆，仅由工作线程访问；
+        # 等待期间工作线程可以继续处理其他命令
+        self._pulse_offs: List[tuple] = []
+        self._pulse_seq = itertools.count()
+        self._worker: Optional[threading.Thread] = None
         
-        # 状态缓存（用于监控显示）
-        self.last_relay_states = [False] * count
-        self.last_input_states = [False] * count
-        self.last_status_time = 0
-        self.status_cache_lock = threading.Lock()
+        # 串口命令分发表：命令名 -> 处理方法（get_status和pulse_relay由工作线程单独处理）
+        self._command_handlers = {
+            "set_relay": self._do_set_relay,
+            "set_relays_mask": self._do_set_relays_mask,
+        }
     
     def _find_free_port(self) -> int:
         """查找空闲的TCP端口（Windows专用）"""
@@ -81,8 +296,13 @@ class USBRelayDaemon:
         if self.lock_file_path and self.lock_file_path.exists():
             os.unlink(self.lock_file_path)
         
-    def start(self):
-        """启动守护进程 - 跨平台版本"""
+    def start(self, ready_fd: Optional[int] = None):
+        """
+        启动守护进程 - 跨平台版本
+        
+        Args:
+            ready_fd: 可选的管道写端，开始监听后写入一个字节并关闭，通知启动本进程的父进程
+        """
         try:
             # 连接设备
             self.controller = USBRelayController(self.port, self.slave_id)
@@ -103,7 +323,21 @@ class USBRelayDaemon:
                 self.server_socket.bind(self.socket_path)
             
             self.server_socket.listen(5)
+            self.server_socket.setblocking(False)
+            
+            # 选择器同时监听新连接、各客户端连接和工作线程的唤醒信号
+            self._selector = selectors.DefaultSelector()
+            self._wakeup_r, self._wakeup_w = socket.socketpair()
+            self._wakeup_r.setblocking(False)
+            self._wakeup_w.setblocking(False)
+            self._selector.register(self.server_socket, selectors.EVENT_READ, "accept")
+            self._selector.register(self._wakeup_r, selectors.EVENT_READ, "wakeup")
+            
             self.running = True
+            self.ready.set()
+            if ready_fd is not None:
+                os.write(ready_fd, b"1")
+                os.close(ready_fd)
             
             print(f"USB继电器守护进程已启动")
             print(f"设备: {self.port}")
@@ -115,37 +349,40 @@ class USBRelayDaemon:
             print("✓ 跨平台守护进程模式 - 智能串口管理")
             print("按 Ctrl+C 停止")
             
-            # 启动后台状态更新线程（低频，避免冲突）
-            threading.Thread(target=self._background_status_update, daemon=True).start()
+            # 启动串口工作线程（执行命令并定时刷新状态）
+            self._worker = threading.Thread(target=self._serial_worker, daemon=True)
+            self._worker.start()
             
-            # 主循环处理客户端
-            while self.running:
-                try:
-                    client_socket, addr = self.server_socket.accept()
-                    # 每个客户端在独立线程中处理，但串口访问受锁保护
-                    threading.Thread(
-                        target=self._handle_client_safe,
-                        args=(client_socket,),
-                        daemon=True
-                    ).start()
-                except Exception as e:
-                    if self.running:
-                        continue
-                    break
+            # 主循环：单线程处理所有客户端连接
+            self._serve()
                 
         except Exception as e:
             print(f"守护进程启动失败: {e}")
+            self.start_error = e
+            self.ready.set()
             self.stop()
+            if self._selector is None and self.server_socket:
+                self.server_socket.close()
             
     def stop(self):
         """停止守护进程 - 跨平台版本"""
         self.running = False
+        # 结束工作线程并唤醒选择器循环，由其关闭所有连接
+        self._commands.put(None)
+        self._wake()
+        
+        # 等工作线程关闭仍在脉冲中的继电器后再断开串口
+        if self._worker is not None and self._worker is not threading.current_thread():
+            self._worker.join(self.STOP_TIMEOUT)
         
         if self.controller:
             self.controller.disconnect()
-            
-        if self.server_socket:
-            self.server_socket.close()
+        
+        with self.subscribers_lock:
+            # 通知同进程订阅者结束
+            for status_queue in self.local_subscribers:
+                status_queue.put(None)
+            self.local_subscribers.clear()
             
         # 跨平台清理
         if self.is_windows:
@@ -156,127 +393,470 @@ class USBRelayDaemon:
             
         print("守护进程已停止")
     
-    def _background_status_update(self):
-        """后台状态更新线程 - 低频更新避免冲突"""
-        while self.running:
-            try:
-                # 尝试获取锁，如果获取不到就跳过这次更新
-                if self.serial_lock.acquire(blocking=False):
-                    try:
-                        # 读取当前状态
-                        relay_states = self.controller.get_all_relay_states(self.count)
-                        relay_list = [s.state for s in relay_states]
-                        
-                        input_states = self.controller.get_all_input_states(self.count)
-                        input_list = [s.state for s in input_states]
-                        
-                        # 更新缓存
-                        with self.status_cache_lock:
-                            self.last_relay_states = relay_list
-                            self.last_input_states = input_list
-                            self.last_status_time = time.time()
-                            
-                    finally:
-                        self.serial_lock.release()
-                
-                # 状态更新间隔0.5秒，提高响应速度
-                time.sleep(0.5)
-                
-            except Exception as e:
-                if self.running:
-                    print(f"\n后台状态更新错误: {e}")
-                time.sleep(2.0)  # 出错后等待更长时间
+    def _status_response(self) -> Dict[str, Any]:
+        """构建当前缓存状态的响应"""
+        relay_states, input_states, last_update = self._status_snapshot
+        return {
+            "success": True,
+            "relay_states": relay_states,
+            "input_states": input_states,
+            "last_update": last_update
+        }
     
-    def _handle_client_safe(self, client_socket):
-        """安全处理客户端连接"""
+    def _encode_status(self):
+        """
+        编码发给套接字客户端的状态消息：继电器和输入状态各打包为一个整数位掩码，
+        由DaemonClient展开为列表。同时生成JSON消息和二进制get_status应答
+        """
+        relay_states, input_states, last_update = self._status_snapshot
+        relay_mask = _states_to_mask(relay_states)
+        input_mask = _states_to_mask(input_states)
+        self._status_message = _encode_message({
+            "success": True,
+            "relay_mask": relay_mask,
+            "input_mask": input_mask,
+            "count": self.count,
+            "last_update": last_update
+        })
+        self._status_binary = _encode_binary_status(relay_mask, input_mask, self.count, last_update)
+    
+    def _publish_status(self):
+        """向所有订阅者推送当前状态"""
+        status = self._status_response()
+        
+        with self.subscribers_lock:
+            for status_queue in self.local_subscribers:
+                status_queue.put(status)
+        
+        # 套接字订阅者由选择器线程负责发送
+        self._post(None, self._status_message)
+    
+    def subscribe_local(self) -> "queue.SimpleQueue":
+        """
+        同进程订阅，无需经过套接字：返回的队列中先放入当前状态，
+        之后每次状态变化放入新状态，守护进程停止时放入None
+        """
+        status_queue = queue.SimpleQueue()
+        status_queue.put(self._status_response())
+        
+        with self.subscribers_lock:
+            self.local_subscribers.append(status_queue)
+        return status_queue
+    
+    def _background_status_update(self) -> float:
+        """读取一次设备状态并更新缓存（仅在串口工作线程中调用），返回距下次刷新的间隔"""
         try:
-            # 设置socket超时
-            client_socket.settimeout(10.0)
+            relay_tup, input_tup = self.controller.get_relay_and_input_states(self.count)
             
+            # 更新缓存：只有本线程写入，整体替换引用即可，读取方无需加锁
+            changed = (relay_tup, input_tup) != self._status_snapshot[:2]
+            self._status_snapshot = (relay_tup, input_tup, time.time())
+            self._encode_status()
+            
+            # 仅在状态变化时推送（边沿触发）
+            if changed:
+                self._publish_status()
+            
+            return self._next_poll_interval()
+            
+        except Exception as e:
+            if self.running:
+                logger.warning("后台状态更新错误: %s", e)
+            return 2.0  # 出错后等待更长时间
+    
+    def _status_is_fresh(self) -> bool:
+        """缓存状态是否在正常刷新周期内更新过"""
+        return time.time() - self._status_snapshot[2] <= self.poll_interval * 2
+    
+    def _next_poll_interval(self) -> float:
+        """
+        距下次状态刷新的间隔：有订阅者或近期有客户端请求时为poll_interval（默认0.5秒），
+        否则每次加倍，减少无人关注时的串口通信和唤醒
+        """
+        if (self._socket_subscribers or self.local_subscribers
+                or time.monotonic() - self._last_request < self.IDLE_AFTER):
+            self._idle_interval = self.poll_interval
+        else:
+            self._idle_interval = min(self._idle_interval * 2, self.MAX_IDLE_POLL_INTERVAL)
+        return self._idle_interval
+    
+    def _serve(self):
+        """选择器循环：接受连接、读取请求、发送响应和状态推送"""
+        # 循环内频繁使用的方法和常量预先绑定为局部变量
+        select = self._selector.select
+        read = self._read
+        write = self._write
+        connections = self._connections
+        EVENT_READ = selectors.EVENT_READ
+        EVENT_WRITE = selectors.EVENT_WRITE
+        try:
             while self.running:
-                data = client_socket.recv(1024)
-                if not data:
-                    break
-                
-                try:
-                    request = json.loads(data.decode())
-                    
-                    # 使用锁保护串口访问，带超时避免死锁
-                    acquired = self.serial_lock.acquire(timeout=3.0)
-                    if not acquired:
-                        response = {"success": False, "error": "设备忙碌，请稍后重试"}
+                for key, events in select():
+                    conn = key.data
+                    if conn == "accept":
+                        self._accept()
+                    elif conn == "wakeup":
+                        self._drain_outbox()
                     else:
-                        try:
-                            response = self._process_request_with_retry(request)
-                        finally:
-                            self.serial_lock.release()
-                    
-                    # 发送响应
-                    client_socket.send(json.dumps(response).encode())
-                    
-                except Exception as e:
-                    error_response = {"success": False, "error": str(e)}
-                    try:
-                        client_socket.send(json.dumps(error_response).encode())
-                    except:
-                        break
-                    
-        except Exception:
-            pass
+                        if events & EVENT_READ:
+                            read(conn)
+                        if events & EVENT_WRITE and conn in connections:
+                            write(conn)
         finally:
+            for conn in list(self._connections):
+                self._close_connection(conn)
+            self._selector.close()
+            self.server_socket.close()
+            self._wakeup_r.close()
+            self._wakeup_w.close()
+    
+    def _accept(self):
+        """接受所有已到达的客户端连接（一次唤醒处理整批并发连接）"""
+        while True:
+            try:
+                client_socket, _ = self.server_socket.accept()
+            except OSError:  # 包括BlockingIOError：没有更多待接受的连接
+                return
+            client_socket.setblocking(False)
+            if self.is_windows:
+                # 响应和状态推送都是小消息，禁用Nagle算法避免延迟发送
+                client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            conn = _Connection(client_socket)
+            self._connections.add(conn)
+            self._selector.register(client_socket, selectors.EVENT_READ, conn)
+    
+    def _read(self, conn: _Connection):
+        """读取客户端数据，按长度前缀拆出完整请求逐个处理"""
+        try:
+            n = conn.sock.recv_into(self._rxbuf)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            n = 0
+        if not n:
+            self._close_connection(conn)
+            return
+        
+        inbuf = conn.inbuf
+        inbuf += self._rxbuf[:n]
+        header_size = _HEADER.size
+        unpack_from = _HEADER.unpack_from
+        dispatch = self._dispatch
+        while len(inbuf) >= header_size:
+            (size,) = unpack_from(inbuf)
+            end = header_size + size
+            if len(inbuf) < end:
+                break
+            body = inbuf[header_size:end]  # 各JSON解码器都直接接受bytearray
+            del inbuf[:end]
+            dispatch(conn, body)
+    
+    def _dispatch(self, conn: _Connection, body: bytearray):
+        """处理一条请求：缓存状态直接应答，串口命令交给工作线程"""
+        try:
+            request = _loads(body) if body[0] == 0x7B else _decode_binary_request(body)  # 0x7B: "{"
+            command = request.get("command")
+        except Exception as e:
+            self._send(conn, _encode_message({"success": False, "error": str(e)}))
+            return
+        
+        self._last_request = time.monotonic()
+        if command == "subscribe":
+            # 订阅连接先收到当前状态，之后由状态变化推送
+            if not conn.subscribed:
+                conn.subscribed = True
+                self._socket_subscribers += 1
+        
+        if command in ("get_status", "subscribe"):
+            if self._status_is_fresh():
+                # 缓存状态足够新，无需占用串口，直接发送预先编码好的响应
+                self._send(conn, self._status_binary if "binary" in request else self._status_message)
+            else:
+                # 空闲期间刷新间隔已延长，缓存可能过期：交给工作线程刷新后再应答，
+                # 同时唤醒工作线程按新的活跃状态恢复正常刷新间隔
+                self._commands.put((conn, request if command == "get_status" else {"command": "get_status"}))
+        else:
+            self._commands.put((conn, request))
+    
+    def _send(self, conn: _Connection, message: bytes):
+        """发送消息，未能立即发完的部分缓存起来等待可写事件"""
+        if conn.outbuf:
+            conn.outbuf += message
+            if len(conn.outbuf) > _MAX_PENDING_OUTPUT:
+                self._close_connection(conn)
+            return
+        
+        try:
+            sent = conn.sock.send(message)
+        except (BlockingIOError, InterruptedError):
+            sent = 0
+        except OSError:
+            self._close_connection(conn)
+            return
+        
+        if sent < len(message):
+            conn.outbuf += message[sent:]
+            self._selector.modify(conn.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, conn)
+    
+    def _write(self, conn: _Connection):
+        """连接可写时继续发送缓存的数据"""
+        try:
+            sent = conn.sock.send(conn.outbuf)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self._close_connection(conn)
+            return
+        
+        del conn.outbuf[:sent]
+        if not conn.outbuf:
+            self._selector.modify(conn.sock, selectors.EVENT_READ, conn)
+    
+    def _close_connection(self, conn: _Connection):
+        """关闭并注销客户端连接"""
+        self._connections.discard(conn)
+        if conn.subscribed:
+            conn.subscribed = False
+            self._socket_subscribers -= 1
+        try:
+            self._selector.unregister(conn.sock)
+        except (KeyError, ValueError):
+            pass
+        try:
+            conn.sock.close()
+        except OSError:
+            pass
+    
+    def _post(self, conn: Optional[_Connection], message: bytes):
+        """从其他线程提交待发送的消息（conn为None表示推送给所有订阅者）"""
+        self._outbox.put((conn, message))
+        self._wake()
+    
+    def _wake(self):
+        """唤醒选择器线程"""
+        if self._wakeup_w is not None:
             try:
-                client_socket.close()
-            except:
+                self._wakeup_w.send(b"\0")
+            except OSError:
+                pass  # 缓冲区已满说明已有未处理的唤醒，或守护进程已停止
+    
+    def _drain_outbox(self):
+        """在选择器线程中发送其他线程提交的消息"""
+        try:
+            while self._wakeup_r.recv(4096):
                 pass
+        except OSError:
+            pass
+        
+        while True:
+            try:
+                conn, message = self._outbox.get_nowait()
+            except queue.Empty:
+                break
+            
+            if conn is None:
+                for subscriber in [c for c in self._connections if c.subscribed]:
+                    self._send(subscriber, message)
+            elif conn in self._connections:
+                self._send(conn, message)
+    
+    def _serial_worker(self):
+        """
+        串口工作线程：按到达顺序逐个执行命令，结果交回选择器线程发送；
+        等待命令超时即到了状态刷新时间，刷新也在本线程完成，串口访问天然互斥
+        """
+        next_update = time.monotonic()
+        pending = ()  # 合并写操作时多取出的一项，下一轮先处理
+        while self.running:
+            deadline = next_update
+            if self._pulse_offs:
+                deadline = min(deadline, self._pulse_offs[0][0])
+            if pending != ():
+                item, pending = pending, ()
+            else:
+                try:
+                    item = self._commands.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    item = ()
+            
+            if item is None:
+                break
+            if item:
+                conn, request = item
+                command = request.get("command")
+                if command == "get_status":
+                    # 缓存过期的状态请求：刷新后发送最新状态（排在前面的请求可能已刷新过）
+                    if not self._status_is_fresh():
+                        next_update = time.monotonic() + self._background_status_update()
+                    self._post(conn, self._status_binary if "binary" in request else self._status_message)
+                    continue
+                if command == "pulse_relay":
+                    self._start_pulse(conn, request)
+                elif self._is_plain_relay_write(request):
+                    pending = self._write_relays_batch(item)
+                else:
+                    self._reply(conn, request, self._process_request_with_retry(request))
+                
+                # 写操作后尽快刷新（待处理的命令优先），使缓存状态反映变化
+                next_update = time.monotonic()
+            
+            if self._finish_due_pulses():
+                next_update = time.monotonic()
+            
+            if not item and time.monotonic() >= next_update:
+                next_update = time.monotonic() + self._background_status_update()
+        
+        # 停止前关闭仍在脉冲中的继电器
+        while self._pulse_offs:
+            _, _, conn, request = heapq.heappop(self._pulse_offs)
+            self._finish_pulse(conn, request)
+    
+    def _is_plain_relay_write(self, request: Dict[str, Any]) -> bool:
+        """是否为可合并的单路设置（明确的开/关状态，非切换）"""
+        relay_id = request.get("relay_id")
+        return (request.get("command") == "set_relay"
+                and isinstance(request.get("state"), bool)
+                and type(relay_id) is int and 1 <= relay_id <= self.count)
+    
+    def _write_relays_batch(self, first: tuple) -> Any:
+        """
+        把队列中已排队的单路设置按编号连续的区段合并为一帧写多个线圈（功能码0FH），
+        结果分别应答各客户端；返回取出但不能合并的一项（没有则返回空元组）。
+        同一继电器再次出现时停止合并，每次开/关都按顺序写到设备
+        """
+        batch = {first[1]["relay_id"]: first}
+        leftover = ()
+        while len(batch) < self.count:
+            try:
+                item = self._commands.get_nowait()
+            except queue.Empty:
+                break
+            if item and self._is_plain_relay_write(item[1]) and item[1]["relay_id"] not in batch:
+                batch[item[1]["relay_id"]] = item
+            else:
+                leftover = item
+                break
+        
+        # 各继电器互不相同，写入顺序不影响结果：按编号分成连续区段，
+        # 只有一路的区段用单路写，区段之间的空隙不读回也不写入
+        run = []
+        for relay_id in sorted(batch):
+            if run and relay_id != run[-1][1]["relay_id"] + 1:
+                self._write_relay_run(run)
+                run = []
+            run.append(batch[relay_id])
+        self._write_relay_run(run)
+        return leftover
+    
+    def _write_relay_run(self, run: List[tuple]):
+        """写入编号连续的一组单路设置并应答各客户端"""
+        if len(run) == 1:
+            conn, request = run[0]
+            self._reply(conn, request, self._process_request_with_retry(request))
+            return
+        
+        mask = affect_mask = 0
+        for _, request in run:
+            bit = 1 << (request["relay_id"] - 1)
+            affect_mask |= bit
+            if request["state"]:
+                mask |= bit
+        response = self._process_request_with_retry(
+            {"command": "set_relays_mask", "mask": mask, "affect_mask": affect_mask})
+        for conn, request in run:
+            self._reply(conn, request, response)
+    
+    def _reply(self, conn: _Connection, request: Dict[str, Any], response: Dict[str, Any]):
+        """按请求的格式编码应答并交给选择器线程发送"""
+        op = request.get("binary")
+        if op is not None and "error" not in response:
+            self._post(conn, _HEADER.pack(_RESULT_RESP.size)
+                       + _RESULT_RESP.pack(op, bool(response.get("success"))))
+        else:
+            self._post(conn, _encode_message(response))
+    
+    def _start_pulse(self, conn: _Connection, request: Dict[str, Any]):
+        """打开继电器并登记延时关闭，关闭后才向客户端应答"""
+        response = self._process_request_with_retry(
+            {"command": "set_relay", "relay_id": request.get("relay_id"), "state": True})
+        if not response.get("success"):
+            self._reply(conn, request, response)
+            return
+        
+        due = time.monotonic() + request.get("duration", 1.0)
+        heapq.heappush(self._pulse_offs, (due, next(self._pulse_seq), conn, request))
+    
+    def _finish_due_pulses(self) -> bool:
+        """关闭已到期的脉冲继电器，返回是否有继电器被关闭"""
+        finished = False
+        now = time.monotonic()
+        while self._pulse_offs and self._pulse_offs[0][0] <= now:
+            _, _, conn, request = heapq.heappop(self._pulse_offs)
+            self._finish_pulse(conn, request)
+            finished = True
+        return finished
+    
+    def _finish_pulse(self, conn: _Connection, request: Dict[str, Any]):
+        """关闭脉冲继电器并应答客户端"""
+        response = self._process_request_with_retry(
+            {"command": "set_relay", "relay_id": request.get("relay_id"), "state": False})
+        self._reply(conn, request, response)
     
     def _process_request_with_retry(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """处理请求，带重试机制"""
-        command = request.get("command")
+        handler = self._command_handlers.get(request.get("command"))
+        if handler is None:
+            return {"success": False, "error": "未知命令"}
         max_retries = 2
         
         for attempt in range(max_retries + 1):
             try:
-                if command == "get_status":
-                    # 返回缓存状态，避免每次都读取
-                    with self.status_cache_lock:
-                        return {
-                            "success": True,
-                            "relay_states": self.last_relay_states.copy(),
-                            "input_states": self.last_input_states.copy(),
-                            "last_update": self.last_status_time
-                        }
-                
-                elif command == "set_relay":
-                    relay_id = request.get("relay_id")
-                    state = request.get("state")
-                    
-                    if state is None:  # toggle
-                        success = self.controller.toggle_relay(relay_id)
-                    else:
-                        success = self.controller.set_relay_state(relay_id, state)
-                    
-                    return {"success": success}
-                
-                elif command == "pulse_relay":
-                    relay_id = request.get("relay_id")
-                    duration = request.get("duration", 1.0)
-                    
-                    self.controller.turn_on_relay(relay_id)
-                    time.sleep(duration)
-                    self.controller.turn_off_relay(relay_id)
-                    
-                    return {"success": True}
-                
-                else:
-                    return {"success": False, "error": "未知命令"}
+                return handler(request)
                     
             except Exception as e:
                 if attempt < max_retries:
-                    print(f"\n命令执行失败，重试 {attempt + 1}/{max_retries}: {e}")
+                    logger.warning("命令执行失败，重试 %d/%d: %s", attempt + 1, max_retries, e)
                     time.sleep(0.1)  # 短暂等待后重试
                     continue
                 else:
                     return {"success": False, "error": str(e)}
+    
+    def _do_set_relay(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """设置单个继电器，state为None时切换"""
+        relay_id = request.get("relay_id")
+        state = request.get("state")
+        
+        if state is None:  # toggle
+            success = self.controller.toggle_relay(relay_id)
+        else:
+            success = self.controller.set_relay_state(relay_id, state)
+        
+        return {"success": success}
+    
+    def _do_set_relays_mask(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        用一帧写多个线圈（功能码0FH）设置多个继电器：
+        mask给出目标状态，affect_mask标记要修改的继电器（第1路为最低位）
+        """
+        mask = request.get("mask", 0)
+        affect_mask = request.get("affect_mask", 0)
+        if affect_mask <= 0:
+            return {"success": True}
+        
+        first = (affect_mask & -affect_mask).bit_length() - 1
+        span = affect_mask.bit_length() - first
+        affected = affect_mask >> first
+        states = _mask_to_states(mask >> first, span)
+        
+        if affected != (1 << span) - 1:
+            # 要修改的继电器不连续：先读回区间内的当前状态，区间中其余继电器保持不变
+            current = self.controller.get_relay_states(first + 1, span)
+            states = [
+                states[i] if (affected >> i) & 1 else current[i].state
+                for i in range(span)
+            ]
+        
+        return {"success": self.controller.set_relay_states(first + 1, states)}
 
 
 class DaemonClient:
@@ -284,22 +864,59 @@ class DaemonClient:
     
     def __init__(self, port: str):
         self.port = port
-        self.is_windows = platform.system().lower() == "windows"
+        self.is_windows = _IS_WINDOWS
         
         if self.is_windows:
             # Windows: 使用锁文件检测和TCP通信
-            self.lock_file_path = Path(tempfile.gettempdir()) / f"usb_relay_daemon_{port.replace('/', '_').replace(':', '_')}.lock"
+            self.lock_file_path = _lock_file_path(port)
             self._cached_tcp_port = None  # 缓存TCP端口，避免重复读取
         else:
             # Linux/macOS: 使用Unix套接字
-            self.socket_path = str(Path(tempfile.gettempdir()) / f"usb_relay_daemon_{port.replace('/', '_')}.sock")
+            self.socket_path = _socket_path(port)
+        
+        # 持久连接：多次命令复用同一套接字，出错时重新连接
+        self._sock: Optional[socket.socket] = None
+        self._sock_lock = threading.Lock()
+        
+        # 最近一次运行检测的(时间, 结果)，短时间内的重复检测直接复用
+        self._last_check = (0.0, False)
     
-    def is_daemon_running(self) -> bool:
-        """检查守护进程是否运行 - 跨平台版本"""
-        if self.is_windows:
-            return self.lock_file_path.exists()
-        else:
-            return os.path.exists(self.socket_path)
+    def close(self) -> None:
+        """关闭持久连接"""
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+            self._sock = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    # 运行检测结果的有效期（秒）
+    RUNNING_CHECK_TTL = 0.5
+    
+    def is_daemon_running(self, use_cache: bool = True) -> bool:
+        """检查守护进程是否运行 - 跨平台版本（结果缓存RUNNING_CHECK_TTL秒）"""
+        now = time.monotonic()
+        if use_cache:
+            ts, running = self._last_check
+            if now - ts < self.RUNNING_CHECK_TTL:
+                return running
+        
+        try:
+            if self.is_windows:
+                os.stat(self.lock_file_path)
+                running = True
+            else:
+                running = stat.S_ISSOCK(os.stat(self.socket_path).st_mode)
+        except OSError:
+            running = False
+        self._last_check = (now, running)
+        return running
     
     def _get_tcp_port(self) -> int:
         """获取TCP端口号（Windows专用，带缓存优化）"""
@@ -319,69 +936,208 @@ class DaemonClient:
             self._cached_tcp_port = None
             raise
     
+    def _connect(self) -> socket.socket:
+        """连接守护进程 - 跨平台版本"""
+        if self.is_windows:
+            # Windows性能优化：复用TCP连接配置
+            tcp_port = self._get_tcp_port()
+            client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            client_socket.settimeout(2.0)  # 缩短超时时间
+            client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # 禁用Nagle算法
+            client_socket.connect(('127.0.0.1', tcp_port))
+        else:
+            # Linux/macOS: Unix套接字
+            client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client_socket.settimeout(5.0)
+            client_socket.connect(self.socket_path)
+        return client_socket
+    
     def send_command(self, command: str, **kwargs) -> Dict[str, Any]:
-        """发送命令到守护进程，带重试机制 - 跨平台版本，性能优化"""
+        """发送命令到守护进程，带重试机制 - 跨平台版本，性能优化（状态应答展开为列表）"""
+        return _expand_status(_loads(self._request(_encode_message({"command": command, **kwargs}))))
+    
+    def _send_binary(self, message: bytes) -> Dict[str, Any]:
+        """发送二进制命令帧；守护进程以JSON应答（如出错时）也能处理"""
+        body = self._request(message)
+        if body[:1] == b"{":
+            return _expand_status(_loads(body))
+        return _decode_binary_response(body)
+    
+    def _request(self, message: bytes) -> bytes:
+        """发送一条已编码的消息并返回应答正文，带重试机制"""
         if not self.is_daemon_running():
             raise Exception("守护进程未运行")
         
         max_retries = 1 if self.is_windows else 2  # Windows减少重试次数
         for attempt in range(max_retries + 1):
+            reused = self._sock is not None
             try:
-                if self.is_windows:
-                    # Windows性能优化：复用TCP连接配置
-                    tcp_port = self._get_tcp_port()
-                    client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                    client_socket.settimeout(2.0)  # 缩短超时时间
-                    client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # 禁用Nagle算法
-                    client_socket.connect(('127.0.0.1', tcp_port))
-                else:
-                    # Linux/macOS: Unix套接字
-                    client_socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-                    client_socket.settimeout(5.0)
-                    client_socket.connect(self.socket_path)
-                
-                request = {"command": command, **kwargs}
-                client_socket.send(json.dumps(request).encode())
-                
-                response_data = client_socket.recv(1024)
-                response = json.loads(response_data.decode())
-                
-                client_socket.close()
-                return response
+                with self._sock_lock:
+                    if self._sock is None:
+                        self._sock = self._connect()
+                    self._sock.sendall(message)
+                    return _recv_frame(self._sock)
                 
             except Exception as e:
+                self.close()
                 if attempt < max_retries:
-                    # Windows优化：更短的重试间隔
-                    time.sleep(0.05 if self.is_windows else 0.1)
+                    # 复用的连接可能已被守护进程因空闲关闭，立即重连；新连接失败才等待
+                    if not reused:
+                        # Windows优化：更短的重试间隔
+                        time.sleep(0.05 if self.is_windows else 0.1)
                     continue
                 else:
-                    # 清除缓存，以防端口变化
+                    # 清除缓存，以防端口变化或守护进程已退出
                     if self.is_windows:
                         self._cached_tcp_port = None
+                    self._last_check = (0.0, False)
                     raise Exception(f"与守护进程通信失败: {e}")
     
     def get_status(self) -> Dict[str, Any]:
         """获取设备状态"""
-        return self.send_command("get_status")
+        return self._send_binary(_GET_STATUS_FRAME)
+    
+    def subscribe(self) -> Iterator[Dict[str, Any]]:
+        """
+        订阅设备状态：守护进程在连接时推送一次当前状态，
+        之后仅在状态变化时推送，连接关闭时迭代结束
+        """
+        if not self.is_daemon_running():
+            raise Exception("守护进程未运行")
+        
+        client_socket = self._connect()
+        try:
+            client_socket.sendall(_encode_message({"command": "subscribe"}))
+            # 状态无变化时守护进程不发送数据，因此不设置读超时
+            client_socket.settimeout(None)
+            while True:
+                try:
+                    yield _expand_status(_recv_message(client_socket))
+                except ConnectionError:
+                    return
+        finally:
+            client_socket.close()
     
     def set_relay(self, relay_id: int, state: Optional[bool] = None) -> bool:
         """设置继电器状态"""
-        response = self.send_command("set_relay", relay_id=relay_id, state=state)
+        body = _SET_RELAY_REQ.pack(_OP_SET_RELAY, relay_id, -1 if state is None else int(state))
+        response = self._send_binary(_HEADER.pack(len(body)) + body)
+        return response.get("success", False)
+    
+    def set_relays(self, mask: int, affect_mask: int) -> bool:
+        """
+        批量设置继电器，守护进程只发送一帧Modbus请求
+        
+        Args:
+            mask: 目标状态位掩码（第1路为最低位）
+            affect_mask: 要修改的继电器位掩码，未置位的继电器保持不变
+        """
+        response = self.send_command("set_relays_mask", mask=mask, affect_mask=affect_mask)
         return response.get("success", False)
     
     def pulse_relay(self, relay_id: int, duration: float = 1.0) -> bool:
         """继电器脉冲控制"""
-        response = self.send_command("pulse_relay", relay_id=relay_id, duration=duration)
+        body = _PULSE_RELAY_REQ.pack(_OP_PULSE_RELAY, relay_id, duration)
+        response = self._send_binary(_HEADER.pack(len(body)) + body)
         return response.get("success", False)
 
 
+class DaemonRelayController:
+    """
+    通过守护进程操作继电器的轻量控制器，
+    提供与USBRelayController相同的继电器和输入接口，串口由守护进程保持打开
+    """
+    
+    def __init__(self, client: DaemonClient):
+        self.client = client
+        self.relay_start_address = 0x0000
+        self.input_start_address = 0x0000
+    
+    def _states(self, key: str, count: Optional[int] = None) -> List[bool]:
+        """
+        从守护进程缓存的状态中取继电器或输入状态（key为relay_states/input_states）；
+        count超出守护进程监控路数时报错，而不是悄悄返回更少的路数
+        """
+        status = self.client.get_status()
+        if not status.get("success"):
+            raise ModbusRTUException(status.get("error", "守护进程状态获取失败"))
+        states = status.get(key, [])
+        if count is None:
+            return states
+        if count > len(states):
+            raise ModbusRTUException(
+                f"守护进程只监控 {len(states)} 路，无法读取 {count} 路"
+                f"（减小--count，或用更大的--count重新启动守护进程）")
+        return states[:count]
+    
+    def get_relay_state(self, relay_id: int) -> RelayState:
+        states = self._states("relay_states")
+        if not 1 <= relay_id <= len(states):
+            raise ModbusRTUException(f"继电器编号超出守护进程监控范围: {relay_id}")
+        return RelayState(relay_id, states[relay_id - 1], self.relay_start_address + relay_id - 1)
+    
+    def get_all_relay_states(self, max_relays: int = 8) -> List[RelayState]:
+        return [
+            RelayState(i + 1, state, self.relay_start_address + i)
+            for i, state in enumerate(self._states("relay_states", max_relays))
+        ]
+    
+    def get_input_state(self, input_id: int) -> InputState:
+        states = self._states("input_states")
+        if not 1 <= input_id <= len(states):
+            raise ModbusRTUException(f"输入编号超出守护进程监控范围: {input_id}")
+        return InputState(input_id, states[input_id - 1], self.input_start_address + input_id - 1)
+    
+    def get_all_input_states(self, max_inputs: int = 8) -> List[InputState]:
+        return [
+            InputState(i + 1, state, self.input_start_address + i)
+            for i, state in enumerate(self._states("input_states", max_inputs))
+        ]
+    
+    def turn_on_relay(self, relay_id: int) -> bool:
+        return self.client.set_relay(relay_id, True)
+    
+    def turn_off_relay(self, relay_id: int) -> bool:
+        return self.client.set_relay(relay_id, False)
+    
+    def toggle_relay(self, relay_id: int) -> bool:
+        return self.client.set_relay(relay_id, None)
+    
+    def pulse_relay(self, relay_id: int, duration: float = 1.0) -> bool:
+        """由守护进程定时关闭继电器，客户端在等待期间退出也不会让继电器保持开启"""
+        return self.client.pulse_relay(relay_id, duration)
+    
+    def set_relay_states(self, start_relay: int, states: List[bool]) -> bool:
+        shift = start_relay - 1
+        affect_mask = ((1 << len(states)) - 1) << shift
+        return self.client.set_relays(_states_to_mask(states) << shift, affect_mask)
+    
+    def turn_on_all_relays(self, max_relays: int = 8) -> bool:
+        return self.set_relay_states(1, [True] * max_relays)
+    
+    def turn_off_all_relays(self, max_relays: int = 8) -> bool:
+        return self.set_relay_states(1, [False] * max_relays)
+
+
+# 按设备端口缓存的客户端，同一进程内的多次命令共用一个持久连接
+_DAEMON_CLIENTS: Dict[str, DaemonClient] = {}
+
+
+def get_daemon_client(port: str) -> DaemonClient:
+    """获取指定端口的共享守护进程客户端"""
+    client = _DAEMON_CLIENTS.get(port)
+    if client is None:
+        client = _DAEMON_CLIENTS[port] = DaemonClient(port)
+    return client
+
+
 def execute_relay_command_smart(port: str, slave_id: int, relay_id: int, action: str, duration: Optional[float] = None):
     """
     智能执行继电器命令：
     - 如果守护进程运行，通过守护进程执行
     - 如果守护进程未运行，直接执行
     """
-    client = DaemonClient(port)
+    client = get_daemon_client(port)
     
     if client.is_daemon_running():
         # 通过守护进程执行
@@ -425,7 +1181,7 @@ def get_status_smart(port: str, slave_id: int, count: int = 4):
     - 如果守护进程运行，通过守护进程获取
     - 如果守护进程未运行，直接获取
     """
-    client = DaemonClient(port)
+    client = get_daemon_client(port)
     
     if client.is_daemon_running():
         try:
@@ -453,35 +1209,118 @@ def get_status_smart(port: str, slave_id: int, count: int = 4):
         return {"success": False, "error": str(e)}
 
 
+def start_log_listener() -> Callable[[], None]:
+    """
+    为守护进程配置日志：日志经队列交给后台线程输出到stderr，
+    串口工作线程记录日志时只需入队，不会阻塞在stderr写入上。
+    返回停止函数，守护进程结束后调用，停止监听器并移除队列处理器
+    """
+    import logging.handlers
+    
+    log_queue = queue.SimpleQueue()
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(logging.Formatter("%(asctime)s - %(levelname)s - %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream_handler)
+    queue_handler = logging.handlers.QueueHandler(log_queue)
+    package_logger = logging.getLogger("usb_relay_rtu")
+    package_logger.addHandler(queue_handler)
+    package_logger.setLevel(logging.INFO)
+    listener.start()
+    
+    def stop():
+        package_logger.removeHandler(queue_handler)
+        listener.stop()
+    
+    return stop
+
+
+def run_daemon(port: str, slave_id: int = 1, count: int = 4, ready_fd: Optional[int] = None):
+    """在当前进程中运行守护进程直到收到SIGINT/SIGTERM（独立守护进程的入口）"""
+    stop_logging = start_log_listener()
+    daemon = USBRelayDaemon(port, slave_id, count)
+    
+    # 设置信号处理
+    def signal_handler(sig, frame):
+        daemon.stop()
+        sys.exit(0)
+    
+    signal.signal(signal.SIGINT, signal_handler)
+    signal.signal(signal.SIGTERM, signal_handler)
+    
+    try:
+        daemon.start(ready_fd=ready_fd)
+    finally:
+        stop_logging()
+
+
+# 等待新启动的守护进程就绪的最长时间（秒）
+DAEMON_START_TIMEOUT = 5.0
+
+
+def _daemon_argv(port: str, slave_id: int, count: int, ready_fd: Optional[int] = None) -> List[str]:
+    """
+    启动守护进程子进程的命令行：按绝对路径运行本模块文件，
+    sys.path首项为本模块所在目录而不是当前工作目录，工作目录中同名的daemon模块不会被误导入；
+    参数与本模块的__main__入口一致
+    """
+    argv = [sys.executable, os.path.abspath(__file__), port, str(slave_id), str(count)]
+    if ready_fd is not None:
+        argv.append(str(ready_fd))
+    return argv
+
+
 def start_daemon_if_needed(port: str, slave_id: int = 1, count: int = 4) -> DaemonClient:
     """如果需要，启动守护进程"""
     client = DaemonClient(port)
     
-    if not client.is_daemon_running():
-        # 启动守护进程
+    if client.is_daemon_running(use_cache=False):
+        return client
+    
+    if _IS_WINDOWS or not hasattr(os, "posix_spawn"):
         import subprocess
-        import time
         
-        # 启动守护进程
-        proc = subprocess.Popen([
-            sys.executable, "-c",
-            f"""
-import sys
-from pathlib import Path
-sys.path.insert(0, str(Path(__file__).parent / 'src'))
-from daemon import USBRelayDaemon
-daemon = USBRelayDaemon('{port}', {slave_id}, {count})
-daemon.start()
-"""
-        ], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(_log_file_path(port), "ab") as log_file:
+            subprocess.Popen(_daemon_argv(port, slave_id, count),
+                             stdin=subprocess.DEVNULL, stdout=log_file, stderr=log_file)
         
-        # 等待守护进程启动
-        for _ in range(10):  # 最多等待5秒
-            if client.is_daemon_running():
-                break
-            time.sleep(0.5)
-        else:
-            raise Exception("守护进程启动超时")
+        # 等待守护进程创建锁文件
+        deadline = time.monotonic() + DAEMON_START_TIMEOUT
+        while not client.is_daemon_running(use_cache=False):
+            if time.monotonic() > deadline:
+                raise Exception("守护进程启动超时")
+            time.sleep(0.05)
+        return client
+    
+    # POSIX：直接posix_spawn子进程，子进程开始监听后通过管道通知，无需轮询
+    ready_r, ready_w = os.pipe()
+    try:
+        os.set_inheritable(ready_w, True)
+        os.posix_spawn(
+            sys.executable,
+            _daemon_argv(port, slave_id, count, ready_w),
+            os.environ,
+            file_actions=[
+                (os.POSIX_SPAWN_OPEN, 0, os.devnull, os.O_RDONLY, 0),
+                # 标准输出和标准错误写入日志文件，后台运行时的警告和错误仍可查看
+                (os.POSIX_SPAWN_OPEN, 1, _log_file_path(port), os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644),
+                (os.POSIX_SPAWN_DUP2, 1, 2),
+            ],
+            setsid=True,  # 脱离当前终端会话，终端的Ctrl+C不会结束守护进程
+        )
+        # 关闭本进程的写端，子进程退出时读端才会收到EOF
+        os.close(ready_w)
+        ready_w = None
+        
+        with selectors.DefaultSelector() as selector:
+            selector.register(ready_r, selectors.EVENT_READ)
+            if not selector.select(DAEMON_START_TIMEOUT):
+                raise Exception("守护进程启动超时")
+        if not os.read(ready_r, 1):
+            raise Exception("守护进程启动失败")
+    finally:
+        os.close(ready_r)
+        if ready_w is not None:
+            os.close(ready_w)
     
     return client
 
@@ -492,15 +1331,7 @@ if __name__ == "__main__":
         port = sys.argv[1]
         slave_id = int(sys.argv[2]) if len(sys.argv) >= 3 else 1
         count = int(sys.argv[3]) if len(sys.argv) >= 4 else 4
+        # 第4个参数为start_daemon_if_needed传入的就绪通知管道
+        ready_fd = int(sys.argv[4]) if len(sys.argv) >= 5 else None
         
-        daemon = USBRelayDaemon(port, slave_id, count)
-        
-        # 设置信号处理
-        def signal_handler(sig, frame):
-            daemon.stop()
-            sys.exit(0)
-        
-        signal.signal(signal.SIGINT, signal_handler)
-        signal.signal(signal.SIGTERM, signal_handler)
-        
-        daemon.start()
+        run_daemon(port, slave_id, count, ready_fd)
@@ -9,21 +9,36 @@
 
 import platform
 import glob
+import time
 import serial.tools.list_ports
 from typing import List, Dict, Optional, Union, Tuple
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 try:
     from .modbus_rtu import ModbusRTUClient, ModbusRTUException
 except ImportError:
     from modbus_rtu import ModbusRTUClient, ModbusRTUException
 
 
+# 运行平台在进程内不会变化，导入时确定一次
+_SYSTEM = platform.system().lower()
+
+# 各平台常见串口设备路径的glob模式（Windows改用pyserial枚举实际存在的COM端口）
+_PORT_GLOB_PATTERNS = {
+    "linux": ("/dev/ttyUSB*", "/dev/ttyACM*", "/dev/ttyS*"),
+    "darwin": ("/dev/tty.usb*", "/dev/cu.usb*", "/dev/tty.wchusbserial*"),
+}
+
+
 @dataclass
 class RelayState:
     """继电器状态数据类"""
     relay_id: int
     state: bool
     address: int
+    address_hex: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.address_hex = f"0x{self.address:04X}"
     
     def __str__(self):
         state_text = "ON" if self.state else "OFF"
@@ -36,6 +51,10 @@ class InputState:
     input_id: int
     state: bool
     address: int
+    address_hex: str = field(init=False, repr=False, compare=False)
+    
+    def __post_init__(self):
+        self.address_hex = f"0x{self.address:04X}"
     
     def __str__(self):
         state_text = "HIGH" if self.state else "LOW"
@@ -57,7 +76,12 @@ class DeviceInfo:
 
 
 class USBRelayController:
-    """USB继电器控制器类"""
+    """
+    USB继电器控制器类
+    
+    写线圈请求在从设备执行写入后才会收到应答，因此写操作返回后
+    立即读取即可得到新状态，调用方无需额外延时等待
+    """
     
     def __init__(self, port: str, slave_id: int = 1, baudrate: int = 9600, timeout: float = 1.0):
         """
@@ -324,6 +348,26 @@ class USBRelayController:
         """
         return self.get_input_states(1, max_inputs)
     
+    def get_relay_and_input_states(self, count: int) -> Tuple[Tuple[bool, ...], Tuple[bool, ...]]:
+        """
+        连续读取前count路继电器和输入状态，用于周期性刷新状态
+        
+        线圈和离散输入是两张独立的Modbus表，仍需两次请求，
+        但两次请求紧接着发出，且直接返回布尔元组，不构造RelayState/InputState对象
+        
+        Args:
+            count: 继电器和输入的路数
+            
+        Returns:
+            Tuple: (继电器状态元组, 输入状态元组)
+        """
+        if not self.is_connected():
+            raise ModbusRTUException("设备未连接")
+        
+        relays = self.client.read_coils(self.slave_id, self.relay_start_address, count)
+        inputs = self.client.read_discrete_inputs(self.slave_id, self.input_start_address, count)
+        return tuple(relays), tuple(inputs)
+    
     def __enter__(self):
         """上下文管理器入口"""
         self.connect()
@@ -337,14 +381,52 @@ class USBRelayController:
 class DeviceManager:
     """设备管理器类"""
     
+    # 串口枚举结果缓存有效期（秒），有效期内的重复扫描直接复用结果
+    PORT_CACHE_TTL = 3.0
+    _port_cache: Optional[Tuple[float, List[DeviceInfo]]] = None
+    
+    # 无VID信息时用于识别USB转串口芯片的描述关键字
+    USB_DESCRIPTION_KEYWORDS = (
+        "USB",
+        "CH34",  # CH340/CH341
+        "CP21",  # CP2102
+        "FT23",  # FTDI
+    )
+    
+    # 常见USB继电器板使用的串口芯片 (VID, PID)
+    RELAY_VID_PID = frozenset({
+        ("0x1a86", "0x7523"),  # CH340
+        ("0x403", "0x6001"),   # FTDI FT232R
+        ("0x10c4", "0xea60"),  # CP210x
+    })
+    
+    # 已知不是继电器板的USB串口设备 (VID, PID)，自动检测时不探测，避免逐个等待Modbus超时
+    NON_RELAY_VID_PID = frozenset({
+        ("0x1546", "0x1a7"),   # u-blox 7 GPS
+        ("0x1546", "0x1a8"),   # u-blox 8 GPS
+        ("0x1546", "0x1a9"),   # u-blox F9 GPS
+        ("0x91e", "0x3"),      # Garmin GPS
+        ("0x12d1", "0x1001"),  # 华为 3G/4G 调制解调器
+        ("0x1199", "0x68a2"),  # Sierra Wireless 调制解调器
+        ("0x2c7c", "0x125"),   # Quectel EC25 调制解调器
+        ("0x483", "0x374b"),   # ST-LINK/V2-1 虚拟串口
+    })
+    
     @staticmethod
-    def list_serial_ports() -> List[DeviceInfo]:
+    def list_serial_ports(use_cache: bool = True) -> List[DeviceInfo]:
         """
         列出所有串口设备
         
+        Args:
+            use_cache: 是否使用短期缓存的枚举结果（热插拔设备后可设为False）
+            
         Returns:
             List[DeviceInfo]: 设备信息列表
         """
+        cached = DeviceManager._port_cache
+        if use_cache and cached is not None and time.monotonic() - cached[0] < DeviceManager.PORT_CACHE_TTL:
+            return list(cached[1])
+        
         ports = []
         
         # 使用pyserial获取串口列表
@@ -359,51 +441,91 @@ class DeviceManager:
             )
             ports.append(device_info)
         
-        return ports
+        DeviceManager._port_cache = (time.monotonic(), ports)
+        return list(ports)
     
     @staticmethod
-    def find_usb_serial_devices() -> List[DeviceInfo]:
+    def find_usb_serial_devices(use_cache: bool = True) -> List[DeviceInfo]:
         """
         查找USB转串口设备
         
+        Args:
+            use_cache: 是否使用短期缓存的枚举结果
+            
         Returns:
             List[DeviceInfo]: USB串口设备列表
         """
         usb_devices = []
-        all_ports = DeviceManager.list_serial_ports()
+        all_ports = DeviceManager.list_serial_ports(use_cache)
         
         for device in all_ports:
-            # 检查是否为USB设备
-            if ("USB" in device.description.upper() or 
-                "CH34" in device.description.upper() or  # CH340/CH341
-                "CP21" in device.description.upper() or  # CP2102
-                "FT23" in device.description.upper() or  # FTDI
-                device.vendor_id != "Unknown"):
+            # 有VID的一定是USB设备，直接命中；否则再按描述关键字判断
+            if device.vendor_id != "Unknown":
+                usb_devices.append(device)
+                continue
+            description = device.description.upper()
+            if any(keyword in description for keyword in DeviceManager.USB_DESCRIPTION_KEYWORDS):
                 usb_devices.append(device)
         
         return usb_devices
     
     @staticmethod
-    def auto_detect_relay_device() -> Optional[str]:
+    def auto_detect_relay_device(use_cache: bool = True) -> Optional[str]:
         """
         自动检测继电器设备
         
+        Args:
+            use_cache: 是否使用短期缓存的枚举结果
+            
         Returns:
             Optional[str]: 设备端口路径，如果未找到则返回None
         """
-        usb_devices = DeviceManager.find_usb_serial_devices()
+        usb_devices = [
+            d for d in DeviceManager.find_usb_serial_devices(use_cache)
+            if (d.vendor_id, d.product_id) not in DeviceManager.NON_RELAY_VID_PID
+        ]
+        if not usb_devices:
+            return None
         
-        # 尝试连接每个USB串口设备
-        for device in usb_devices:
-            try:
-                with USBRelayController(device.port) as controller:
-                    if controller.test_connection():
-                        return device.port
-            except Exception:
-                continue
+        # 常见继电器板芯片的端口优先探测，避免在其他设备上耗尽超时
+        usb_devices.sort(key=lambda d: (d.vendor_id, d.product_id) not in DeviceManager.RELAY_VID_PID)
+        
+        # 最可能的候选直接在当前线程探测，无需线程池开销
+        first = usb_devices[0]
+        if (first.vendor_id, first.product_id) in DeviceManager.RELAY_VID_PID:
+            if DeviceManager._probe_port(first.port):
+                return first.port
+            usb_devices = usb_devices[1:]
+        
+        if not usb_devices:
+            return None
+        
+        # 其余端口并行探测，总耗时约为一次超时而非逐个超时累加
+        from concurrent.futures import ThreadPoolExecutor, as_completed
+        
+        executor = ThreadPoolExecutor(max_workers=min(8, len(usb_devices)))
+        futures = {executor.submit(DeviceManager._probe_port, d.port): d.port for d in usb_devices}
+        try:
+            for future in as_completed(futures):
+                if future.result():
+                    return futures[future]
+        finally:
+            # 找到设备后不等待其余仍在超时中的探测
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=False)
         
         return None
     
+    @staticmethod
+    def _probe_port(port: str) -> bool:
+        """尝试连接端口并读取一次状态，判断是否为继电器设备"""
+        try:
+            with USBRelayController(port) as controller:
+                return controller.test_connection()
+        except Exception:
+            return False
+    
     @staticmethod
     def get_platform_specific_ports() -> List[str]:
         """
@@ -412,41 +534,11 @@ class DeviceManager:
         Returns:
             List[str]: 串口设备路径列表
         """
-        system = platform.system().lower()
-        
-        if system == "linux":
-            # Linux常见串口设备
-            patterns = [
-                "/dev/ttyUSB*",
-                "/dev/ttyACM*",
-                "/dev/ttyS*"
-            ]
-            ports = []
-            for pattern in patterns:
-                ports.extend(glob.glob(pattern))
-            return sorted(ports)
-            
-        elif system == "windows":
-            # Windows性能优化：使用pyserial扫描实际存在的COM端口
-            # 避免生成COM1-255的耗时循环
-            ports = []
-            for port_info in serial.tools.list_ports.comports():
-                ports.append(port_info.device)
-            return sorted(ports)
-            
-        elif system == "darwin":  # macOS
-            # macOS串口设备
-            patterns = [
-                "/dev/tty.usb*",
-                "/dev/cu.usb*",
-                "/dev/tty.wchusbserial*"
-            ]
-            ports = []
-            for pattern in patterns:
-                ports.extend(glob.glob(pattern))
-            return sorted(ports)
-        else:
-            return []
+        if _SYSTEM == "windows":
+            # 复用串口枚举的短期缓存，避免生成COM1-255的耗时循环
+            return sorted(device.port for device in DeviceManager.list_serial_ports())
+        
+        return sorted(port for pattern in _PORT_GLOB_PATTERNS.get(_SYSTEM, ()) for port in glob.glob(pattern))
 
 
 class RelaySequence:
@@ -519,24 +611,23 @@ class RelaySequence:
         """
         import time
         
+        # 每步只有一路继电器开启：整组线圈状态用一帧写多个线圈（功能码0FH）一次写入，
+        # 省去逐路开、关之间的空档；各步的状态向量预先生成
+        forward = [[i == k for i in range(relay_count)] for k in range(relay_count)]
+        steps = forward + forward[::-1]
+        all_off = [False] * relay_count
+        
         try:
             # 先关闭所有继电器
-            for i in range(1, relay_count + 1):
-                self.controller.turn_off_relay(i)
+            self.controller.set_relay_states(1, all_off)
             
             for cycle in range(cycles):
-                # 正向流水
-                for i in range(1, relay_count + 1):
-                    self.controller.turn_on_relay(i)
-                    time.sleep(delay)
-                    self.controller.turn_off_relay(i)
-                
-                # 反向流水
-                for i in range(relay_count, 0, -1):
-                    self.controller.turn_on_relay(i)
+                # 正向流水，然后反向流水
+                for states in steps:
+                    self.controller.set_relay_states(1, states)
                     time.sleep(delay)
-                    self.controller.turn_off_relay(i)
             
+            self.controller.set_relay_states(1, all_off)
             return True
         except Exception:
             return False
@@ -165,6 +165,12 @@ class ModbusRTUClient:
     FUNCTION_WRITE_MULTIPLE_COILS = 0x0F
     FUNCTION_WRITE_MULTIPLE_REGISTERS = 0x10
     
+    # 异常响应帧长度：地址(1) + 功能码(1) + 错误码(1) + CRC(2)
+    EXCEPTION_FRAME_LENGTH = 5
+    
+    # 单次读线圈/离散输入的最大数量（Modbus协议规定）
+    MAX_READ_BITS = 2000
+    
     def __init__(self, port: str, baudrate: int = 9600, timeout: float = 1.0):
         """
         初始化Modbus RTU客户端
@@ -179,6 +185,10 @@ class ModbusRTUClient:
         self.timeout = timeout
         self.serial_port: Optional[serial.Serial] = None
         
+        # 帧间静默时间：3.5个字符（每字符11位），波特率高于19200时协议规定固定为1.75ms
+        self._silent_interval = 3.5 * 11 / baudrate if baudrate <= 19200 else 0.00175
+        self._last_frame_end = 0.0  # 上一帧收发结束的时刻（time.monotonic）
+        
     def connect(self) -> None:
         """连接串口设备"""
         try:
@@ -195,6 +205,22 @@ class ModbusRTUClient:
             self.serial_port.flushOutput()
         except serial.SerialException as e:
             raise ModbusRTUException(f"无法连接串口设备 {self.port}: {e}")
+        
+        self._enable_low_latency()
+    
+    def _enable_low_latency(self) -> None:
+        """
+        开启串口低延迟模式（Linux ASYNC_LOW_LATENCY），
+        避免USB转串口芯片默认16ms的延迟定时器拖慢每次请求响应；
+        其他平台或驱动不支持时保持默认设置
+        """
+        set_low_latency_mode = getattr(self.serial_port, "set_low_latency_mode", None)
+        if set_low_latency_mode is None:
+            return
+        try:
+            set_low_latency_mode(True)
+        except (ValueError, OSError):
+            pass
     
     def disconnect(self) -> None:
         """断开串口连接"""
@@ -211,14 +237,37 @@ class ModbusRTUClient:
         if not self.is_connected():
             raise ModbusRTUException("串口未连接")
         
+        # 保证与上一帧之间有足够的静默时间，否则设备可能把两帧当作一帧
+        wait = self._last_frame_end + self._silent_interval - time.monotonic()
+        if wait > 0:
+            time.sleep(wait)
+        
+        # 丢弃上次超时后才到达的残留字节，避免被当作本次响应的开头
+        self.serial_port.reset_input_buffer()
         self.serial_port.write(frame)
         self.serial_port.flush()
     
     def _receive_frame(self, expected_length: int = None) -> bytes:
-        """接收数据帧"""
+        """
+        接收数据帧
+        
+        Args:
+            expected_length: 预期的正常响应长度。已知时按长度整块读取，
+                避免逐块轮询；未知时按10ms帧间空闲判断帧结束
+        """
         if not self.is_connected():
             raise ModbusRTUException("串口未连接")
         
+        if expected_length:
+            # 先读取异常响应的长度（地址+功能码+错误码+CRC），异常帧到此结束
+            data = self.serial_port.read(self.EXCEPTION_FRAME_LENGTH)
+            if not data:
+                raise ModbusRTUTimeoutException("接收数据超时")
+            if (len(data) == self.EXCEPTION_FRAME_LENGTH and not data[1] & 0x80
+                    and expected_length > len(data)):
+                data += self.serial_port.read(expected_length - len(data))
+            return data
+        
         # 等待数据
         start_time = time.time()
         while self.serial_port.in_waiting == 0:
@@ -246,6 +295,21 @@ class ModbusRTUClient:
         
         return bytes(data)
     
+    def _expected_response_length(self, function_code: int, data: bytes) -> Optional[int]:
+        """根据请求计算正常响应帧的长度，未知功能码返回None"""
+        if function_code in (self.FUNCTION_READ_COILS, self.FUNCTION_READ_DISCRETE_INPUTS):
+            count = struct.unpack('>H', data[2:4])[0]
+            # 地址 + 功能码 + 字节数 + 位数据 + CRC
+            return 5 + (count + 7) // 8
+        if function_code in (self.FUNCTION_READ_HOLDING_REGISTERS, self.FUNCTION_READ_INPUT_REGISTERS):
+            count = struct.unpack('>H', data[2:4])[0]
+            return 5 + count * 2
+        if function_code in (self.FUNCTION_WRITE_SINGLE_COIL, self.FUNCTION_WRITE_SINGLE_REGISTER,
+                             self.FUNCTION_WRITE_MULTIPLE_COILS, self.FUNCTION_WRITE_MULTIPLE_REGISTERS):
+            # 地址 + 功能码 + 起始地址/数值(4) + CRC
+            return 8
+        return None
+    
     def _build_frame(self, slave_id: int, function_code: int, data: bytes) -> bytes:
         """构建Modbus RTU数据帧"""
         frame = struct.pack('BB', slave_id, function_code) + data
@@ -288,7 +352,10 @@ class ModbusRTUClient:
         self._send_frame(request_frame)
         
         # 接收响应
-        response_data = self._receive_frame()
+        try:
+            response_data = self._receive_frame(self._expected_response_length(function_code, data))
+        finally:
+            self._last_frame_end = time.monotonic()
         
         # 解析响应
         response = self._parse_response(response_data)
@@ -304,6 +371,40 @@ class ModbusRTUClient:
         
         return response
     
+    @staticmethod
+    def _unpack_bits(packed: bytes, count: int) -> List[bool]:
+        """
+        将位打包的响应数据展开为布尔列表（低位在前，缺失的字节视为0）
+        
+        Args:
+            packed: 响应中的位数据
+            count: 需要展开的位数
+            
+        Returns:
+            List[bool]: 位状态列表
+        """
+        bits = int.from_bytes(packed, 'little')
+        return [(bits >> i) & 1 == 1 for i in range(count)]
+    
+    @staticmethod
+    def min_poll_interval(baudrate: int) -> float:
+        """
+        计算有意义的最小轮询间隔（秒）：
+        请求和响应各需3.5字符（每字符11位）的帧间静默，再加上设备响应时间
+        
+        Args:
+            baudrate: 波特率
+            
+        Returns:
+            float: 最小轮询间隔，不低于10ms
+        """
+        return max(0.01, (3.5 * 11 / baudrate) * 2 + 0.002)
+    
+    def _check_bit_count(self, count: int):
+        """检查位读取数量是否在协议允许范围内，一次读取即可返回全部状态"""
+        if not 1 <= count <= self.MAX_READ_BITS:
+            raise ModbusRTUException(f"读取数量超出范围: {count}（应为1-{self.MAX_READ_BITS}）")
+    
     def read_coils(self, slave_id: int, start_address: int, count: int) -> List[bool]:
         """
         读取线圈状态（功能码01H）
@@ -316,22 +417,12 @@ class ModbusRTUClient:
         Returns:
             List[bool]: 线圈状态列表
         """
+        self._check_bit_count(count)
         data = struct.pack('>HH', start_address, count)
         response = self.execute_request(slave_id, self.FUNCTION_READ_COILS, data)
         
         byte_count = response.data[0]
-        coil_data = response.data[1:1+byte_count]
-        
-        coils = []
-        for i in range(count):
-            byte_index = i // 8
-            bit_index = i % 8
-            if byte_index < len(coil_data):
-                coils.append((coil_data[byte_index] >> bit_index) & 1 == 1)
-            else:
-                coils.append(False)
-        
-        return coils
+        return self._unpack_bits(response.data[1:1+byte_count], count)
     
     def read_discrete_inputs(self, slave_id: int, start_address: int, count: int) -> List[bool]:
         """
@@ -345,22 +436,12 @@ class ModbusRTUClient:
         Returns:
             List[bool]: 输入状态列表
         """
+        self._check_bit_count(count)
         data = struct.pack('>HH', start_address, count)
         response = self.execute_request(slave_id, self.FUNCTION_READ_DISCRETE_INPUTS, data)
         
         byte_count = response.data[0]
-        input_data = response.data[1:1+byte_count]
-        
-        inputs = []
-        for i in range(count):
-            byte_index = i // 8
-            bit_index = i % 8
-            if byte_index < len(input_data):
-                inputs.append((input_data[byte_index] >> bit_index) & 1 == 1)
-            else:
-                inputs.append(False)
-        
-        return inputs
+        return self._unpack_bits(response.data[1:1+byte_count], count)
     
     def read_holding_registers(self, slave_id: int, start_address: int, count: int) -> List[int]:
         """
@@ -0,0 +1,129 @@
+"""
+配置管理模块测试
+"""
+
+import os
+import json
+import pytest
+from src import config
+from src.config import ConfigManager, ProfileManager
+
+
+@pytest.fixture(autouse=True)
+def clear_parsed_cache():
+    """每个测试前后清空解析缓存，模拟新进程读取文件"""
+    config._PARSED_CACHE.clear()
+    yield
+    config._PARSED_CACHE.clear()
+
+
+class TestConfigManager:
+    """测试配置管理器"""
+    
+    @pytest.mark.parametrize("format", ["json", "yaml", "yml", "xml"])
+    def test_save_load_round_trip(self, tmp_path, format):
+        """测试保存后在新进程中能加载回相同配置（不支持的格式按默认格式保存）"""
+        manager = ConfigManager(str(tmp_path))
+        manager.update_serial_config(port="/dev/ttyUSB3", baudrate=19200)
+        manager.update_device_config(max_relays=16)
+        assert manager.save_config(format)
+        
+        config._PARSED_CACHE.clear()
+        loaded = ConfigManager(str(tmp_path))
+        assert loaded.load_config(format)
+        assert loaded.get_serial_config().port == "/dev/ttyUSB3"
+        assert loaded.get_serial_config().baudrate == 19200
+        assert loaded.get_device_config().max_relays == 16
+
+
+class TestParsedCache:
+    """测试已解析配置文件的缓存"""
+    
+    def test_cache_hit_when_file_unchanged(self, tmp_path):
+        """测试文件未变化时直接返回缓存的解析结果"""
+        path = tmp_path / "data.json"
+        path.write_text('{"a": 1}', encoding="utf-8")
+        
+        first = config._load_file(path, "json")
+        assert config._load_file(path, "json") is first
+    
+    def test_cache_invalidated_by_external_write(self, tmp_path):
+        """测试文件被外部改写（大小或修改时间变化）后重新解析"""
+        path = tmp_path / "data.json"
+        path.write_text('{"a": 1}', encoding="utf-8")
+        assert config._load_file(path, "json") == {"a": 1}
+        
+        # 大小变化
+        path.write_text('{"a": 100}', encoding="utf-8")
+        assert config._load_file(path, "json") == {"a": 100}
+        
+        # 大小相同，仅修改时间变化（文件系统时间戳精度可能较粗，显式设置修改时间）
+        mtime_ns = path.stat().st_mtime_ns
+        path.write_text('{"a": 200}', encoding="utf-8")
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+        assert config._load_file(path, "json") == {"a": 100}  # 大小和修改时间都未变，命中缓存
+        os.utime(path, ns=(mtime_ns + 1_000_000, mtime_ns + 1_000_000))
+        assert config._load_file(path, "json") == {"a": 200}
+
+
+class TestProfileManager:
+    """测试配置档案管理器"""
+    
+    def _save(self, tmp_path, port="/dev/ttyUSB1"):
+        """保存一个档案并清空解析缓存，返回(配置管理器, 档案管理器)"""
+        manager = ConfigManager(str(tmp_path))
+        manager.update_serial_config(port=port)
+        profiles = ProfileManager(manager)
+        assert profiles.save_profile("bench", "测试档案")
+        config._PARSED_CACHE.clear()
+        return manager, profiles
+    
+    def test_sidecar_takes_priority(self, tmp_path):
+        """测试JSON副本不早于YAML档案时优先使用副本"""
+        manager, profiles = self._save(tmp_path)
+        sidecar = profiles._sidecar_path("bench")
+        assert sidecar.exists()
+        
+        data = json.loads(sidecar.read_text(encoding="utf-8"))
+        data["serial"]["port"] = "/dev/ttyUSB9"
+        sidecar.write_text(json.dumps(data), encoding="utf-8")
+        
+        manager.reset_to_defaults()
+        assert profiles.load_profile("bench")
+        assert manager.get_serial_config().port == "/dev/ttyUSB9"
+    
+    def test_corrupt_sidecar_falls_back_to_yaml(self, tmp_path):
+        """测试副本损坏时回退为解析YAML档案"""
+        manager, profiles = self._save(tmp_path)
+        profiles._sidecar_path("bench").write_text("{broken", encoding="utf-8")
+        
+        manager.reset_to_defaults()
+        assert profiles.load_profile("bench")
+        assert manager.get_serial_config().port == "/dev/ttyUSB1"
+    
+    def test_delete_profile_removes_sidecar(self, tmp_path):
+        """测试删除档案时一并删除副本"""
+        _, profiles = self._save(tmp_path)
+        assert profiles.delete_profile("bench")
+        assert not profiles._sidecar_path("bench").exists()
+        assert not profiles.load_profile("bench")
+    
+    def test_meta_scanner_skips_full_parse(self, tmp_path, monkeypatch):
+        """测试列出档案时只解析name/description两项，不完整解析档案"""
+        _, profiles = self._save(tmp_path)
+        
+        def fail_full_parse(*args, **kwargs):
+            raise AssertionError("不应完整解析档案")
+        
+        monkeypatch.setattr(config, "_load_file", fail_full_parse)
+        listed = profiles.list_profiles()
+        assert [(p["name"], p["description"]) for p in listed] == [("bench", "测试档案")]
+    
+    def test_meta_scanner_falls_back_when_keys_missing(self, tmp_path):
+        """测试档案缺少name/description时回退为完整解析"""
+        path = tmp_path / "old.yaml"
+        path.write_text("config:\n  serial:\n    port: /dev/ttyS0\nname: old\n", encoding="utf-8")
+        
+        meta = config._read_profile_meta(path)
+        assert meta["name"] == "old"
+        assert meta["config"]["serial"]["port"] == "/dev/ttyS0"
@@ -0,0 +1,362 @@
+"""
+守护进程测试（使用模拟控制器，无需真实设备）
+"""
+
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+import pytest
+from src import daemon
+
+pytestmark = pytest.mark.skipif(daemon._IS_WINDOWS, reason="测试使用Unix套接字")
+
+
+class FakeController:
+    """模拟USBRelayController，记录每次写操作；gate未置位时写操作阻塞，delay模拟串口耗时"""
+    
+    def __init__(self, port, slave_id=1):
+        self.relays = [False] * 64
+        self.inputs = [False] * 64
+        self.calls = []
+        self.gate = threading.Event()
+        self.gate.set()
+        self.entered = threading.Event()  # 已有写操作开始执行
+        self.delay = 0.0
+    
+    def connect(self):
+        pass
+    
+    def disconnect(self):
+        self.calls.append(("disconnect",))
+    
+    def get_relay_and_input_states(self, count):
+        return tuple(self.relays[:count]), tuple(self.inputs[:count])
+    
+    def set_relay_state(self, relay_id, state):
+        self.entered.set()
+        self.gate.wait()
+        time.sleep(self.delay)
+        self.calls.append(("set_relay_state", relay_id, state))
+        self.relays[relay_id - 1] = state
+        return True
+    
+    def set_relay_states(self, start_relay, states):
+        self.entered.set()
+        self.gate.wait()
+        self.calls.append(("set_relay_states", start_relay, list(states)))
+        self.relays[start_relay - 1:start_relay - 1 + len(states)] = states
+        return True
+    
+    def toggle_relay(self, relay_id):
+        self.entered.set()
+        self.gate.wait()
+        self.calls.append(("toggle_relay", relay_id))
+        self.relays[relay_id - 1] = not self.relays[relay_id - 1]
+        return True
+
+
+@pytest.fixture
+def start_daemon(monkeypatch):
+    """在临时目录的Unix套接字上启动使用模拟控制器的守护进程，返回(守护进程, 客户端)"""
+    tmpdir = tempfile.mkdtemp(prefix="relay")
+    monkeypatch.setattr(daemon, "_TMPDIR", tmpdir)
+    monkeypatch.setattr(daemon, "USBRelayController", FakeController)
+    started = []
+    
+    def start(count=4):
+        # 端口名各不相同，避免命中按端口缓存的套接字路径
+        port = f"{os.path.basename(tmpdir)}_{len(started)}"
+        relay_daemon = daemon.USBRelayDaemon(port, 1, count, poll_interval=0.05)
+        threading.Thread(target=relay_daemon.start, daemon=True).start()
+        assert relay_daemon.ready.wait(5)
+        client = daemon.DaemonClient(port)
+        started.append((relay_daemon, client))
+        return relay_daemon, client
+    
+    yield start
+    
+    for relay_daemon, client in started:
+        client.close()
+        if relay_daemon.running:
+            relay_daemon.stop()
+    shutil.rmtree(tmpdir, ignore_errors=True)
+
+
+def _wait_for(predicate, timeout=2.0):
+    """等待条件成立"""
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "等待超时"
+        time.sleep(0.005)
+
+
+class TestPulse:
+    """测试由工作线程调度的脉冲关闭"""
+    
+    def test_reply_after_off_write(self, start_daemon):
+        """测试脉冲应答在关闭继电器之后才返回"""
+        relay_daemon, client = start_daemon()
+        controller = relay_daemon.controller
+        
+        started = time.monotonic()
+        assert client.pulse_relay(2, 0.1)
+        assert time.monotonic() - started >= 0.1
+        assert controller.calls[-1] == ("set_relay_state", 2, False)
+        assert ("set_relay_state", 2, True) in controller.calls
+        assert not controller.relays[1]
+    
+    def test_pending_pulse_switched_off_on_stop(self, start_daemon):
+        """测试停止守护进程时关闭仍在脉冲中的继电器，然后才断开串口"""
+        relay_daemon, client = start_daemon()
+        controller = relay_daemon.controller
+        
+        def pulse():
+            try:
+                with client:
+                    client.send_command("pulse_relay", relay_id=3, duration=30)
+            except Exception:
+                pass  # 守护进程停止时连接被关闭
+        
+        threading.Thread(target=pulse, daemon=True).start()
+        _wait_for(lambda: controller.relays[2])
+        
+        controller.delay = 0.05
+        relay_daemon.stop()
+        assert not controller.relays[2]
+        assert controller.calls[-2:] == [("set_relay_state", 3, False), ("disconnect",)]
+
+
+class TestBinaryProtocol:
+    """测试set_relay/pulse_relay/get_status的二进制帧"""
+    
+    def test_set_relay_round_trip(self, start_daemon):
+        """测试二进制设置、切换继电器，应答为二进制结果帧"""
+        relay_daemon, client = start_daemon()
+        controller = relay_daemon.controller
+        
+        body = daemon._SET_RELAY_REQ.pack(daemon._OP_SET_RELAY, 1, 1)
+        response = client._request(daemon._HEADER.pack(len(body)) + body)
+        assert daemon._RESULT_RESP.unpack(response) == (daemon._OP_SET_RELAY, 1)
+        assert controller.relays[0]
+        
+        assert client.set_relay(1, None)  # 切换
+        assert not controller.relays[0]
+        assert controller.calls[-1] == ("toggle_relay", 1)
+    
+    def test_pulse_relay_round_trip(self, start_daemon):
+        """测试二进制脉冲请求，应答为二进制结果帧"""
+        relay_daemon, client = start_daemon()
+        
+        body = daemon._PULSE_RELAY_REQ.pack(daemon._OP_PULSE_RELAY, 2, 0.01)
+        response = client._request(daemon._HEADER.pack(len(body)) + body)
+        assert daemon._RESULT_RESP.unpack(response) == (daemon._OP_PULSE_RELAY, 1)
+        assert relay_daemon.controller.calls[-2:] == [
+            ("set_relay_state", 2, True), ("set_relay_state", 2, False)]
+    
+    def test_get_status_round_trip(self, start_daemon):
+        """测试二进制状态请求，应答为二进制状态帧"""
+        relay_daemon, client = start_daemon()
+        relay_daemon.controller.relays[1] = True
+        relay_daemon.controller.inputs[3] = True
+        relay_daemon._background_status_update()
+        
+        response = client._request(daemon._GET_STATUS_FRAME)
+        assert response[0] == daemon._OP_GET_STATUS
+        status = daemon._decode_binary_response(response)
+        assert status["success"] and status["count"] == 4
+        assert status["relay_states"] == [False, True, False, False]
+        assert status["input_states"] == [False, False, False, True]
+        assert client.get_status()["relay_states"] == status["relay_states"]
+    
+    def test_json_error_reply(self, start_daemon):
+        """测试出错时守护进程以JSON应答，客户端按首字节"{"识别"""
+        relay_daemon, client = start_daemon()
+        
+        response = client._send_binary(daemon._HEADER.pack(1) + bytes([0xEE]))
+        assert response["success"] is False
+        assert "238" in response["error"]  # 未知操作码0xEE
+        
+        def fail(relay_id, state):
+            raise OSError("串口已断开")
+        
+        relay_daemon.controller.set_relay_state = fail
+        response = client._send_binary(
+            daemon._HEADER.pack(daemon._SET_RELAY_REQ.size)
+            + daemon._SET_RELAY_REQ.pack(daemon._OP_SET_RELAY, 1, 1))
+        assert response == {"success": False, "error": "串口已断开"}
+        assert not client.set_relay(1, True)
+    
+    @pytest.mark.parametrize("count", [9, 12, 16, 20])
+    def test_mask_encoding_above_8(self, start_daemon, count):
+        """测试超过8路时状态位掩码跨字节编码"""
+        relay_daemon, client = start_daemon(count)
+        controller = relay_daemon.controller
+        controller.relays[count - 1] = True
+        controller.relays[8] = True
+        controller.inputs[count - 2] = True
+        relay_daemon._background_status_update()
+        
+        status = client.get_status()
+        expected_relays = [False] * count
+        expected_relays[8] = expected_relays[count - 1] = True
+        expected_inputs = [False] * count
+        expected_inputs[count - 2] = True
+        assert status["count"] == count
+        assert status["relay_states"] == expected_relays
+        assert status["input_states"] == expected_inputs
+        
+        frame = daemon._encode_binary_status(
+            daemon._states_to_mask(expected_relays), daemon._states_to_mask(expected_inputs), count, 1.5)
+        assert len(frame) == daemon._HEADER.size + daemon._STATUS_RESP.size + 2 * ((count + 7) // 8)
+        decoded = daemon._decode_binary_response(frame[daemon._HEADER.size:])
+        assert decoded["relay_states"] == expected_relays
+        assert decoded["last_update"] == 1.5
+
+
+class TestWriteBatching:
+    """测试排队的单路设置合并为一帧写多个线圈"""
+    
+    def _hold_worker(self, relay_daemon, client):
+        """让工作线程阻塞在第一次写操作中，之后的请求在队列中排队"""
+        controller = relay_daemon.controller
+        controller.gate.clear()
+        first = threading.Thread(target=client.set_relay, args=(1, True))
+        first.start()
+        assert controller.entered.wait(2)
+        return first
+    
+    def _send_queued(self, relay_daemon, requests):
+        """每个请求用单独的客户端连接发送，逐个等到其进入命令队列"""
+        threads = []
+        for relay_id, state in requests:
+            def send(client=daemon.DaemonClient(relay_daemon.port), relay_id=relay_id, state=state):
+                with client:
+                    client.set_relay(relay_id, state)
+            
+            thread = threading.Thread(target=send)
+            thread.start()
+            threads.append(thread)
+            _wait_for(lambda: relay_daemon._commands.qsize() == len(threads))
+        return threads
+    
+    def test_burst_merged_into_one_write(self, start_daemon):
+        """测试排队的多个单路设置合并为一次write_multiple_coils"""
+        relay_daemon, client = start_daemon()
+        controller = relay_daemon.controller
+        
+        threads = [self._hold_worker(relay_daemon, client)]
+        threads += self._send_queued(relay_daemon, [(2, True), (4, True), (3, True)])
+        controller.gate.set()
+        for thread in threads:
+            thread.join(2)
+        
+        assert controller.calls == [
+            ("set_relay_state", 1, True),
+            ("set_relay_states", 2, [True, True, True]),
+        ]
+        assert controller.relays[:4] == [True] * 4
+    
+    def test_toggle_not_merged(self, start_daemon):
+        """测试切换请求不参与合并，且保持请求顺序"""
+        relay_daemon, client = start_daemon()
+        controller = relay_daemon.controller
+        
+        threads = [self._hold_worker(relay_daemon, client)]
+        threads += self._send_queued(relay_daemon, [(2, True), (3, None), (4, True)])
+        controller.gate.set()
+        for thread in threads:
+            thread.join(2)
+        
+        assert controller.calls == [
+            ("set_relay_state", 1, True),
+            ("set_relay_state", 2, True),
+            ("toggle_relay", 3),
+            ("set_relay_state", 4, True),
+        ]
+    
+    def test_repeated_relay_not_collapsed(self, start_daemon):
+        """测试同一继电器的开、关不合并为最终状态，两次写入都按顺序到达设备"""
+        relay_daemon, client = start_daemon()
+        controller = relay_daemon.controller
+        
+        threads = [self._hold_worker(relay_daemon, client)]
+        threads += self._send_queued(relay_daemon, [(2, True), (2, False)])
+        controller.gate.set()
+        for thread in threads:
+            thread.join(2)
+        
+        assert controller.calls == [
+            ("set_relay_state", 1, True),
+            ("set_relay_state", 2, True),
+            ("set_relay_state", 2, False),
+        ]
+    
+    def test_gaps_split_into_contiguous_runs(self, start_daemon):
+        """测试编号不连续时按连续区段分别写入，不读回空隙中的继电器"""
+        relay_daemon, client = start_daemon(8)
+        controller = relay_daemon.controller
+        
+        threads = [self._hold_worker(relay_daemon, client)]
+        threads += self._send_queued(relay_daemon, [(8, True), (3, True), (4, True)])
+        controller.gate.set()
+        for thread in threads:
+            thread.join(2)
+        
+        assert controller.calls == [
+            ("set_relay_state", 1, True),
+            ("set_relay_states", 3, [True, True]),
+            ("set_relay_state", 8, True),
+        ]
+
+
+class TestDaemonRelayController:
+    """测试通过守护进程读取状态的控制器"""
+    
+    def test_input_states_and_count_limit(self, start_daemon):
+        """测试输入状态来自守护进程缓存，请求路数超出监控范围时报错"""
+        relay_daemon, client = start_daemon()
+        relay_daemon.controller.inputs[1] = True
+        relay_daemon._background_status_update()
+        controller = daemon.DaemonRelayController(client)
+        
+        assert [s.state for s in controller.get_all_input_states(4)] == [False, True, False, False]
+        assert controller.get_input_state(2).state
+        assert len(controller.get_all_relay_states(3)) == 3
+        with pytest.raises(daemon.ModbusRTUException):
+            controller.get_all_relay_states(8)
+        with pytest.raises(daemon.ModbusRTUException):
+            controller.get_input_state(5)
+
+
+class TestStartup:
+    """测试守护进程启动"""
+    
+    def test_start_failure_signalled_immediately(self, start_daemon, monkeypatch):
+        """测试启动失败时立即置位ready并记录原因，等待方无需等到超时"""
+        def fail_connect(self):
+            raise OSError("设备不存在")
+        
+        monkeypatch.setattr(FakeController, "connect", fail_connect)
+        relay_daemon = daemon.USBRelayDaemon("missing", 1, 4)
+        threading.Thread(target=relay_daemon.start, daemon=True).start()
+        
+        assert relay_daemon.ready.wait(1)
+        assert str(relay_daemon.start_error) == "设备不存在"
+
+
+class TestLogListener:
+    """测试守护进程的队列日志"""
+    
+    def test_stop_removes_queue_handler(self):
+        """测试停止后移除队列处理器，重复启动不会重复输出"""
+        package_logger = logging.getLogger("usb_relay_rtu")
+        before = list(package_logger.handlers)
+        
+        for _ in range(2):
+            stop_logging = daemon.start_log_listener()
+            assert len(package_logger.handlers) == len(before) + 1
+            stop_logging()
+        assert package_logger.handlers == before
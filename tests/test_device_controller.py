@@ -0,0 +1,30 @@
+"""
+设备控制模块测试
+"""
+
+from src.device_controller import DeviceInfo, DeviceManager
+
+
+def _device(port, vendor_id, product_id):
+    """构造USB串口设备信息"""
+    return DeviceInfo(port=port, description="USB Serial", manufacturer="Unknown",
+                      vendor_id=vendor_id, product_id=product_id, serial_number="Unknown")
+
+
+class TestDeviceManager:
+    """测试设备管理器"""
+    
+    def test_auto_detect_skips_known_non_relay_devices(self, monkeypatch):
+        """测试自动检测不探测已知的非继电器设备，继电器芯片优先探测"""
+        devices = [
+            _device("/dev/ttyACM0", "0x1546", "0x1a8"),  # u-blox GPS
+            _device("/dev/ttyUSB1", "0x67b", "0x2303"),
+            _device("/dev/ttyUSB0", "0x1a86", "0x7523"),  # CH340
+        ]
+        probed = []
+        monkeypatch.setattr(DeviceManager, "find_usb_serial_devices", staticmethod(lambda use_cache=True: devices))
+        monkeypatch.setattr(DeviceManager, "_probe_port", staticmethod(lambda port: probed.append(port) or False))
+        
+        assert DeviceManager.auto_detect_relay_device() is None
+        assert probed[0] == "/dev/ttyUSB0"
+        assert sorted(probed) == ["/dev/ttyUSB0", "/dev/ttyUSB1"]
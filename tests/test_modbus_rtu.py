@@ -3,6 +3,7 @@ Modbus RTU模块测试
 """
 
 import pytest
+import serial
 from src.modbus_rtu import ModbusCRC16, ModbusRTUClient, ModbusRTUException
 
 
@@ -77,6 +78,55 @@ class TestModbusRTUClient:
         # 验证CRC（最后两个字节）
         expected_crc = bytes([0x0C, 0x14])
         assert frame[6:8] == expected_crc
+    
+    def test_unpack_bits(self):
+        """测试位数据展开（低位在前，缺失字节补0）"""
+        bits = ModbusRTUClient._unpack_bits(bytes([0b00000101, 0b00000001]), 10)
+        
+        assert bits == [True, False, True, False, False, False, False, False, True, False]
+        assert ModbusRTUClient._unpack_bits(b"", 3) == [False, False, False]
+    
+    def test_receive_frame_by_expected_length(self):
+        """测试按预期长度接收响应，异常响应提前结束"""
+        client = ModbusRTUClient("loop://", timeout=0.1)
+        client.serial_port = serial.serial_for_url("loop://", timeout=0.1)
+        
+        # 读4个线圈的正常响应：01 01 01 05 + CRC
+        response = client._build_frame(0x01, 0x01, bytes([0x01, 0x05]))
+        client.serial_port.write(response)
+        expected = client._expected_response_length(0x01, bytes([0x00, 0x00, 0x00, 0x04]))
+        assert expected == len(response)
+        assert client._receive_frame(expected) == response
+        
+        # 异常响应只有5字节
+        error = client._build_frame(0x01, 0x81, bytes([0x02]))
+        client.serial_port.write(error)
+        assert client._receive_frame(expected) == error
+    
+    def test_send_frame_discards_stale_input(self):
+        """测试发送请求前丢弃串口中残留的迟到字节"""
+        client = ModbusRTUClient("loop://", timeout=0.1)
+        client.serial_port = serial.serial_for_url("loop://", timeout=0.1)
+        
+        client.serial_port.write(b"\xff\xff")  # 上次请求超时后才到达的字节
+        frame = client._build_frame(0x01, 0x01, bytes([0x00, 0x00, 0x00, 0x04]))
+        client._send_frame(frame)
+        assert client.serial_port.read(len(frame) + 2) == frame
+    
+    def test_read_bits_count_limit(self):
+        """测试位读取数量超出协议范围时直接拒绝，不发送请求"""
+        client = ModbusRTUClient("/dev/null")
+        
+        with pytest.raises(ModbusRTUException):
+            client.read_coils(1, 0, 2001)
+        with pytest.raises(ModbusRTUException):
+            client.read_discrete_inputs(1, 0, 0)
+    
+    def test_min_poll_interval(self):
+        """测试最小轮询间隔随波特率变化且不低于10ms"""
+        assert 0.01 <= ModbusRTUClient.min_poll_interval(9600) < 0.011
+        assert ModbusRTUClient.min_poll_interval(1200) > ModbusRTUClient.min_poll_interval(9600)
+        assert ModbusRTUClient.min_poll_interval(115200) == 0.01
 
 
 if __name__ == "__main__":